@@ -1,28 +1,80 @@
 import asyncio
+import bisect
+import contextlib
+import functools
 import hashlib
+import heapq
+import ipaddress
+import json
+import math
+import multiprocessing
+import os
 import re
-from collections import Counter, deque
-from dataclasses import dataclass, field
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import Any, Deque, Dict, List, Optional, Set, Tuple
-from urllib.parse import urljoin, urldefrag, urlparse
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Literal, Optional, Set, Tuple
+from urllib.parse import unquote_plus, urljoin, urldefrag, urlparse, urlsplit, urlunsplit
 
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
+import httpcore
 import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString
+
+# lxml is much faster than the stdlib parser; fall back if it is missing
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# HTTP/2 needs the h2 package (httpx[http2]); HTTP/1.1 is used without it
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
 
 # Playwright for JS-rendered sites (lazy import)
 try:
     from playwright.async_api import async_playwright
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
     PLAYWRIGHT_AVAILABLE = True
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
     async_playwright = None
+    PlaywrightTimeoutError = asyncio.TimeoutError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start process-wide resources (HTTP client, browser pool, extraction executor) and release them on shutdown."""
+    EXTRACTION_POOL.start()
+    HTTP_CLIENT.start()
+    await BROWSER_POOL.start()
+    try:
+        yield
+    finally:
+        await JOB_MANAGER.close()
+        await BROWSER_POOL.close()
+        await HTTP_CLIENT.close()
+        EXTRACTION_POOL.close()
+        HTTP_CACHE.close()
 
 
-app = FastAPI(title="Voice AI Optimized Crawler", version="2.1.1")
+app = FastAPI(title="Voice AI Optimized Crawler", version="2.1.1", lifespan=lifespan)
 @app.get("/")
 async def root():
     return {"status": "ok"}
@@ -38,6 +90,34 @@ DEFAULT_HEADERS = {
 }
 
 
+# HTTP cache behaviour: use (revalidate cached copies), refresh (refetch and
+# overwrite), bypass (neither read nor write the cache)
+CacheMode = Literal["use", "refresh", "bypass"]
+
+
+class UrlCanonicalization(BaseModel):
+    """Rules deciding when two URLs are the same page for the frontier."""
+    enabled: bool = True
+    lowercase_host: bool = True  # also drops the default port
+    unify_scheme: bool = True  # http:// and https:// are the same page
+    strip_trailing_slash: bool = True
+    strip_index_pages: bool = True  # /index.html, /index.php, /default.aspx...
+    drop_tracking_params: bool = True  # utm_*, fbclid, gclid...
+    drop_session_params: bool = True  # jsessionid, PHPSESSID, sid...
+    sort_query: bool = True
+    ignored_params: List[str] = []  # extra query parameters to drop (case-insensitive)
+    use_link_canonical: bool = True  # mark a fetched page's <link rel=canonical> visited
+
+
+class RenderBlocking(BaseModel):
+    """Requests aborted while rendering with Playwright: only the DOM text is kept."""
+    enabled: bool = True
+    resource_types: List[str] = ["image", "media", "font"]  # Playwright resource types
+    block_stylesheets: bool = False  # may change what lazy-loading scripts consider visible
+    block_trackers: bool = True  # analytics and ad hosts (TRACKER_HOSTS)
+    blocked_hosts: List[str] = []  # extra hosts to block, subdomains included
+
+
 class CrawlRequest(BaseModel):
     url: HttpUrl
     depth: int = 1
@@ -52,7 +132,21 @@ class CrawlRequest(BaseModel):
     sitemap_url: Optional[str] = None
     sitemap_max_urls: int = 100
     use_js_rendering: bool = True  # Auto-detect and use Playwright for JS sites
+    respect_crawl_delay: bool = True  # Honour robots.txt Crawl-delay (per host)
     max_concurrent: int = 10  # Maximum concurrent requests for parallel crawling
+    cache_mode: CacheMode = "use"  # On-disk HTTP response cache
+    use_result_cache: bool = True  # Reuse a recent identical crawl's output
+    stream: bool = False  # Stream page sections as soon as each page is processed
+    near_duplicate_threshold: float = 0.9  # Collapse pages at least this similar (0 = off)
+    boilerplate_threshold: float = 0.5  # Strip blocks found on more than this share of pages (0 = off)
+    canonicalization: UrlCanonicalization = UrlCanonicalization()  # Frontier dedup rules
+    max_bytes_per_page: int = 5 * 1024 * 1024  # Longer HTML bodies are cut to this prefix
+    skip_binary_extensions: bool = True  # Never request .pdf, .zip, .mp4... links
+    render_blocking: RenderBlocking = RenderBlocking()  # Request interception during JS rendering
+    render_budget: float = 10.0  # Max seconds per JS render (capped by timeout)
+    render_scroll: bool = True  # Scroll rendered pages until lazy loading adds nothing
+    prioritize: bool = True  # Fetch the most useful pages (contact, about, services...) first
+    priority_weights: Optional[Dict[str, float]] = None  # Per page type, overrides PRIORITY_WEIGHTS
 
 
 @dataclass
@@ -68,6 +162,9 @@ class PageContent:
     contact_info: Dict[str, Any] = field(default_factory=dict)
     structured_data: Dict[str, Any] = field(default_factory=dict)
     content_hash: str = ""
+    simhash: Optional[int] = None  # Near-duplicate fingerprint of the markdown
+    render_mode: str = "static"  # "static" (httpx) or "js" (Playwright)
+    render_mode_source: str = "detected"  # "detected" on this page, or "memo" (learned for the host)
 
 
 def is_probably_html(response: httpx.Response) -> bool:
@@ -75,6 +172,22 @@ def is_probably_html(response: httpx.Response) -> bool:
     return "text/html" in content_type or content_type.startswith("text/")
 
 
+# Links to these are documents or media, never HTML pages
+BINARY_EXTENSIONS = frozenset({
+    'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'ods', 'odp', 'rtf', 'epub',
+    'zip', 'rar', '7z', 'tar', 'gz', 'tgz', 'bz2', 'xz', 'dmg', 'exe', 'msi', 'apk', 'iso', 'bin',
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'bmp', 'tif', 'tiff', 'ico', 'svg', 'heic',
+    'mp3', 'wav', 'ogg', 'flac', 'm4a', 'aac', 'mp4', 'm4v', 'mov', 'avi', 'mkv', 'webm', 'wmv', 'flv',
+    'woff', 'woff2', 'ttf', 'otf', 'eot', 'css', 'js', 'json', 'xml', 'csv',
+})
+
+
+def has_binary_extension(url: str) -> bool:
+    path = urlsplit(url).path
+    _, dot, extension = path.rpartition('/')[2].rpartition('.')
+    return bool(dot) and extension.lower() in BINARY_EXTENSIONS
+
+
 def same_registered_domain(url_a: str, url_b: str) -> bool:
     a = urlparse(url_a)
     b = urlparse(url_b)
@@ -95,16 +208,279 @@ def normalize_url(candidate: str, base: str) -> Optional[str]:
     return absolute
 
 
-def extract_links(html: str, base_url: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links: List[str] = []
+def parse_html(html: str) -> BeautifulSoup:
+    """Parse a page once; every pipeline stage reads from the returned document."""
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+def extract_links(html: str, base_url: str, soup: Optional[BeautifulSoup] = None) -> List[str]:
+    return [href for href, _ in extract_link_anchors(html, base_url, soup)]
+
+
+def extract_link_anchors(html: str, base_url: str,
+                         soup: Optional[BeautifulSoup] = None) -> List[Tuple[str, str]]:
+    """(absolute URL, anchor text) for every link; the text falls back to title/aria-label."""
+    if soup is None:
+        soup = parse_html(html)
+    links: List[Tuple[str, str]] = []
     for a in soup.find_all("a", href=True):
         href = normalize_url(a.get("href"), base_url)
         if href:
-            links.append(href)
+            text = a.get_text(" ", strip=True) or a.get("title") or a.get("aria-label") or ""
+            links.append((href, text[:120]))
     return links
 
 
+# ============================================================================
+# URL CANONICALIZATION
+# ============================================================================
+
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid', 'twclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src',
+}
+TRACKING_PARAM_PREFIXES = ('utm_', 'pk_', 'matomo_')
+SESSION_PARAMS = {
+    'jsessionid', 'phpsessid', 'aspsessionid', 'sid', 'sessionid', 'session_id', 'sessid', 'cfid', 'cftoken',
+}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+_PATH_SESSION_RE = re.compile(r';(?:jsessionid|phpsessid|sid)=[^/?#]*', re.IGNORECASE)
+_INDEX_PAGE_RE = re.compile(r'/(?:index|default)\.(?:html?|php|aspx?|jsp)$', re.IGNORECASE)
+
+
+def canonicalize_url(url: str, rules: UrlCanonicalization) -> str:
+    """URL to fetch for `url`: same page, without the noise the rules remove.
+
+    Only rewrites that keep the document (and its base for relative links)
+    unchanged are applied here; see canonical_key for the visited key.
+    """
+    if not rules.enabled:
+        return url
+    parsed = urlsplit(url)
+    netloc = parsed.netloc
+    if rules.lowercase_host and parsed.hostname:
+        host = parsed.hostname
+        if ':' in host:
+            host = f"[{host}]"
+        if parsed.port and parsed.port != DEFAULT_PORTS.get(parsed.scheme):
+            host = f"{host}:{parsed.port}"
+        userinfo = netloc.rpartition('@')[0]
+        netloc = f"{userinfo}@{host}" if userinfo else host
+    path = parsed.path
+    query = parsed.query
+    if rules.drop_session_params:
+        path = _PATH_SESSION_RE.sub('', path)
+    if query:
+        ignored = {p.lower() for p in rules.ignored_params}
+        params = []
+        for pair in query.split('&'):
+            if not pair:
+                continue
+            name = unquote_plus(pair.split('=', 1)[0]).lower()
+            if name in ignored:
+                continue
+            if rules.drop_tracking_params and (name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)):
+                continue
+            if rules.drop_session_params and name in SESSION_PARAMS:
+                continue
+            params.append(pair)
+        if rules.sort_query:
+            params.sort()
+        query = '&'.join(params)
+    return urlunsplit((parsed.scheme.lower(), netloc, path or '/', query, ''))
+
+
+def canonical_key(url: str, rules: UrlCanonicalization) -> str:
+    """Frontier/visited key: URLs with the same key are fetched once."""
+    if not rules.enabled:
+        return url
+    parsed = urlsplit(canonicalize_url(url, rules))
+    path = parsed.path
+    if rules.strip_index_pages:
+        path = _INDEX_PAGE_RE.sub('/', path)
+    if rules.strip_trailing_slash and len(path) > 1:
+        path = path.rstrip('/') or '/'
+    # Scheme-relative ("//host/path") when http and https are unified
+    scheme = '' if rules.unify_scheme else parsed.scheme
+    return urlunsplit((scheme, parsed.netloc, path, parsed.query, ''))
+
+
+# ============================================================================
+# METRICS (PROMETHEUS TEXT FORMAT)
+# ============================================================================
+
+# Histogram buckets: latencies in seconds, sizes in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Metric:
+    """A counter, gauge or histogram family, keyed by label values.
+
+    Label values are passed positionally in `labelnames` order. Recording is
+    a dict lookup and an addition under a lock, cheap enough to stay on in
+    production. A gauge may instead be read from `collect` at scrape time.
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = (), collect: Optional[Callable[[], float]] = None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.collect = collect
+        # counter/gauge: labels -> value; histogram: labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def _label_text(self, labels: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.collect is not None:
+            lines.append(f"{self.name} {float(self.collect())}")
+            return lines
+        with self._lock:
+            items = sorted((labels, list(v) if isinstance(v, list) else v) for labels, v in self._values.items())
+        for labels, value in items:
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._label_text(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), value[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {value[-1]}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Metric:
+        return self._register(Metric("counter", name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              collect: Optional[Callable[[], float]] = None) -> Metric:
+        return self._register(Metric("gauge", name, documentation, labelnames, collect=collect))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Metric:
+        return self._register(Metric("histogram", name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+FETCH_SECONDS = METRICS.histogram(
+    "mdcrawler_fetch_seconds", "Static HTML fetch latency.", ("host_class", "outcome"))
+FETCH_BYTES = METRICS.histogram(
+    "mdcrawler_fetch_bytes", "Bytes downloaded per static fetch (cache replays excluded).",
+    ("host_class",), buckets=SIZE_BUCKETS)
+CONNECT_SECONDS = METRICS.histogram(
+    "mdcrawler_connect_seconds", "Time to open a new connection: tcp (DNS + connect) or tls handshake.",
+    ("phase",))
+RENDER_SECONDS = METRICS.histogram(
+    "mdcrawler_render_seconds", "Playwright render latency, including the wait for a browser slot.",
+    ("host_class", "outcome"))
+EXTRACT_SECONDS = METRICS.histogram(
+    "mdcrawler_extract_seconds", "Extraction time per stage (queue = executor overhead and wait).",
+    ("stage",))
+PAGES_TOTAL = METRICS.counter(
+    "mdcrawler_pages_total", "Pages processed by crawls.", ("host_class", "outcome"))
+JS_FALLBACKS = METRICS.counter(
+    "mdcrawler_js_fallbacks_total", "Pages re-rendered with Playwright after static extraction.",
+    ("host_class",))
+DUPLICATES_DROPPED = METRICS.counter(
+    "mdcrawler_duplicates_dropped_total", "Pages dropped from the output as duplicates.", ("kind",))
+RENDER_BLOCKED_REQUESTS = METRICS.counter(
+    "mdcrawler_render_blocked_requests_total", "Requests aborted during Playwright renders.",
+    ("reason", "resource_type"))
+RENDER_BLOCKED_BYTES = METRICS.counter(
+    "mdcrawler_render_blocked_bytes_estimated_total",
+    "Bytes not downloaded thanks to blocked render requests (typical size per resource type).",
+    ("reason", "resource_type"))
+RENDER_MODE_DECISIONS = METRICS.counter(
+    "mdcrawler_render_mode_decisions_total",
+    "Render mode per page: detected on the page or reused from the host's memo.", ("mode", "source"))
+ACTIVE_CRAWLS = METRICS.gauge("mdcrawler_active_crawls", "Crawls currently running.")
+ACTIVE_BROWSERS = METRICS.gauge(
+    "mdcrawler_active_browsers", "Chromium instances alive in the browser pool (including retiring ones).",
+    collect=lambda: BROWSER_POOL.browsers_alive())
+
+
+def host_class(url: str) -> str:
+    """Low-cardinality host label for metrics: ``local``, ``ip`` or the TLD."""
+    host = urlparse(url).hostname or ""
+    if host == "localhost" or host.endswith(".localhost"):
+        return "local"
+    tld = host.rsplit(".", 1)[-1]
+    if ":" in host or tld.isdigit():
+        return "ip"
+    return tld if tld.isalnum() and len(tld) <= 24 else "other"
+
+
+def connection_trace() -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+    """httpcore trace hook timing new connections into CONNECT_SECONDS.
+
+    Pass as ``extensions={"trace": connection_trace()}``; requests served on
+    a pooled keep-alive connection record nothing.
+    """
+    started: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        if not event_name.startswith("connection."):
+            return
+        step, _, status = event_name[len("connection."):].rpartition(".")
+        if step not in ("connect_tcp", "start_tls"):
+            return
+        if status == "started":
+            started[step] = time.perf_counter()
+        elif status == "complete" and step in started:
+            CONNECT_SECONDS.observe(time.perf_counter() - started.pop(step), "tcp" if step == "connect_tcp" else "tls")
+
+    return trace
+
+
 # ============================================================================
 # TEXT NORMALIZATION & CLEANING
 # ============================================================================
@@ -235,61 +611,54 @@ def detect_language(soup: BeautifulSoup, url: str, text: str) -> str:
     return 'unknown'
 
 
-def detect_page_type(url: str, title: str, soup: BeautifulSoup) -> str:
-    """Detect the type of page: home, store, product, category, service, faq, etc."""
-    url_lower = url.lower()
-    title_lower = title.lower()
-    
-    # Homepage detection
-    parsed = urlparse(url)
-    if parsed.path in ['/', '', '/fr', '/de', '/fr/', '/de/']:
+HOME_PATHS = {'/', '', '/fr', '/de', '/fr/', '/de/'}
+
+# URL fragments identifying a page type, checked in order (first match wins)
+PAGE_TYPE_URL_SIGNALS = [
+    ('store', ['/magasin', '/store', '/location', '/cointrin', '/conthey', '/crissier', '/neuchatel']),
+    ('product', ['/product/', '/produit/', '/p/']),
+    ('category', ['/category/', '/categorie/', '/c/', '/catalogue', '/velo-', '/vtt-', '/gravel']),
+    ('service', ['/service', '/prestation', '/nettoyage', '/menage']),
+    ('faq', ['faq', 'question']),
+    ('contact', ['contact']),
+    ('about', ['/about', '/a-propos', '/ueber-uns']),
+]
+
+
+def page_type_from_url(url: str) -> str:
+    """Page type implied by the URL alone (see detect_page_type)."""
+    if urlparse(url).path in HOME_PATHS:
         return 'home'
-    
-    # Store/Location page
-    if any(x in url_lower for x in ['/magasin', '/store', '/location', '/cointrin', '/conthey', '/crissier', '/neuchatel']):
-        return 'store'
-    
-    # Product page - specific product
-    if any(x in url_lower for x in ['/product/', '/produit/', '/p/']):
-        return 'product'
-    
-    # Category/Catalog page
-    if any(x in url_lower for x in ['/category/', '/categorie/', '/c/', '/catalogue', '/velo-', '/vtt-', '/gravel']):
-        return 'category'
-    
-    # Service page
-    if any(x in url_lower for x in ['/service', '/prestation', '/nettoyage', '/menage']):
-        return 'service'
-    
-    # FAQ page
-    if 'faq' in url_lower or 'question' in url_lower:
-        return 'faq'
-    
-    # Contact page
-    if 'contact' in url_lower:
-        return 'contact'
-    
-    # About page
-    if any(x in url_lower for x in ['/about', '/a-propos', '/ueber-uns']):
-        return 'about'
-    
-    # Default to generic page
+    url_lower = url.lower()
+    for page_type, fragments in PAGE_TYPE_URL_SIGNALS:
+        if any(x in url_lower for x in fragments):
+            return page_type
     return 'page'
 
 
+def detect_page_type(url: str, title: str, soup: BeautifulSoup) -> str:
+    """Detect the type of page: home, store, product, category, service, faq, etc."""
+    return page_type_from_url(url)
+
+
 # ============================================================================
 # CONTENT EXTRACTION & STRUCTURING
 # ============================================================================
 
+# Street types opening a Swiss (FR) street address
+STREET_PREFIX = r'(?:Route|Rue|Avenue|Chemin|Place)'
+_STREET_ADDRESS_RE = re.compile(STREET_PREFIX + r'\s')
+
+
 def extract_contact_info(soup: BeautifulSoup, text: str) -> Dict[str, Any]:
-    """Extract and structure contact information."""
+    """Extract and structure contact information (lists in order of first appearance)."""
     contact = {}
     
     # Email detection
     email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
     emails = re.findall(email_pattern, text)
     if emails:
-        contact['emails'] = list(set(emails))
+        contact['emails'] = list(dict.fromkeys(emails))
     
     # Phone detection
     phone_pattern = r'(?:\+41|0041|0)\s*\d{1,2}\s*\d{3}\s*\d{2}\s*\d{2}'
@@ -304,7 +673,7 @@ def extract_contact_info(soup: BeautifulSoup, text: str) -> Dict[str, Any]:
     
     # Address detection (Swiss addresses)
     address_patterns = [
-        r'(?:Route|Rue|Avenue|Chemin|Place)\s+[^,\n]{3,50}(?:,\s*\d{4}\s+[A-ZÀ-ÿ][a-zà-ÿ]+)?',
+        STREET_PREFIX + r'\s+[^,\n]{3,50}(?:,\s*\d{4}\s+[A-ZÀ-ÿ][a-zà-ÿ]+)?',
         r'\d{4}\s+[A-ZÀ-ÿ][a-zà-ÿ]+(?:,\s*Suisse)?'
     ]
     addresses = []
@@ -312,7 +681,7 @@ def extract_contact_info(soup: BeautifulSoup, text: str) -> Dict[str, Any]:
         found = re.findall(pattern, text)
         addresses.extend(found)
     if addresses:
-        contact['addresses'] = [normalize_text(addr) for addr in set(addresses)]
+        contact['addresses'] = list(dict.fromkeys(normalize_text(addr) for addr in addresses))
     
     return contact
 
@@ -488,19 +857,44 @@ NAVIGATION_PATTERNS = [
     r'^rte des jeunes',  # Address fragments
 ]
 
+_REGEX_METACHARS = set('.^$*+?{}[]|()\\')
+
+
+def compile_pattern_matcher(patterns: List[str]) -> Tuple[frozenset, Optional[re.Pattern]]:
+    """Split anchored plain-text patterns (``^word$``) into a literal set and
+    merge the remaining regexes into one compiled alternation (for re.match)."""
+    literals = set()
+    regexes = []
+    for pattern in patterns:
+        body = pattern[1:-1] if pattern.startswith('^') and pattern.endswith('$') else None
+        if body and not any(c in _REGEX_METACHARS for c in body):
+            literals.add(body.lower())
+        else:
+            regexes.append(f'(?:{pattern})')
+    combined = re.compile('|'.join(regexes), re.IGNORECASE) if regexes else None
+    return frozenset(literals), combined
+
+
+NAVIGATION_LITERALS, NAVIGATION_REGEX = compile_pattern_matcher(NAVIGATION_PATTERNS)
+
+_HEADING_BRACKETS = str.maketrans('', '', '[]')
+
+
+@functools.lru_cache(maxsize=8192)
 def is_navigation_item(text: str) -> bool:
     """Check if text is a navigation/menu item."""
     text_clean = text.lower().strip('- ').strip()
-    for pattern in NAVIGATION_PATTERNS:
-        if re.match(pattern, text_clean, re.IGNORECASE):
-            return True
-    return False
+    if text_clean in NAVIGATION_LITERALS:
+        return True
+    return NAVIGATION_REGEX is not None and NAVIGATION_REGEX.match(text_clean) is not None
 
+
+@functools.lru_cache(maxsize=8192)
 def is_noise_heading(text: str) -> bool:
     """Check if heading is marketing noise."""
     text_clean = text.lower().strip('# ').strip()
     # Remove markdown brackets
-    text_clean = re.sub(r'\[|\]', '', text_clean)
+    text_clean = text_clean.translate(_HEADING_BRACKETS)
     return text_clean in NOISE_HEADINGS or len(text_clean) < 3
 
 
@@ -548,6 +942,119 @@ def compute_content_hash(text: str) -> str:
     return hashlib.md5(normalized.encode()).hexdigest()
 
 
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 4  # words per shingle
+MIN_SHINGLES = 8  # shorter texts get no fingerprint (too noisy to compare)
+_WORD_RE = re.compile(r'\w+')
+
+
+def compute_simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word shingles; None if the text is too short."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    bit_rows = [
+        format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'big'), '064b')
+        for s in shingles
+    ]
+    # Majority vote per bit position (columns are read most significant first)
+    half = len(bit_rows) / 2
+    fingerprint = 0
+    for column in zip(*bit_rows):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """LSH index over SimHash fingerprints.
+
+    Two fingerprints are near-duplicates when they differ in at most
+    `max_distance` bits, i.e. similarity ``1 - distance / 64 >= threshold``.
+    Fingerprints are split into `max_distance + 1` bands: by pigeonhole, a
+    near-duplicate shares at least one band exactly, so lookups only compare
+    against same-band candidates and the whole crawl runs in roughly linear
+    time.
+    """
+
+    def __init__(self, threshold: float):
+        self.max_distance = max(0, min(SIMHASH_BITS - 1, int((1 - threshold) * SIMHASH_BITS + 1e-9)))
+        n_bands = self.max_distance + 1
+        bounds = [round(i * SIMHASH_BITS / n_bands) for i in range(n_bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """Return an indexed fingerprint within `max_distance` bits, if any."""
+        for (shift, mask), table in zip(self._bands, self._tables):
+            for candidate in table.get((fingerprint >> shift) & mask, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint: int) -> None:
+        for (shift, mask), table in zip(self._bands, self._tables):
+            table.setdefault((fingerprint >> shift) & mask, []).append(fingerprint)
+
+
+def page_facts_key(page: "PageContent") -> str:
+    """Hash of the page's phones, emails, street addresses and opening hours ("" if none).
+
+    These are rendered apart from the markdown, so two pages with the same
+    text but a different address or opening hours (a chain's store pages)
+    are not duplicates of each other. Only the reliable fields are used: a
+    bare postcode match also catches years ("2024 Nous..."), which would make
+    every page unique. Lists are sorted, so the key does not depend on
+    extraction order.
+    """
+    contact = page.contact_info or {}
+    facts = {
+        'phones': sorted({phone['e164'] for phone in contact.get('phones', [])}),
+        'emails': sorted({email.lower() for email in contact.get('emails', [])}),
+        'addresses': sorted({addr for addr in contact.get('addresses', []) if _STREET_ADDRESS_RE.match(addr)}),
+        'opening_hours': (page.structured_data or {}).get('opening_hours'),
+    }
+    if not any(facts.values()):
+        return ""
+    return compute_content_hash(json.dumps(facts, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class PageDeduplicator:
+    """Drop pages whose content was already emitted: exact (content hash) or
+    near-duplicate (SimHash within `near_threshold`, 0 disables). Only pages
+    with the same contact details and structured data are compared. The first
+    page of each group is kept as its representative."""
+
+    def __init__(self, near_threshold: float = 0.0):
+        self.near_threshold = near_threshold
+        self._seen_hashes: Set[Tuple[str, str]] = set()
+        # One index per page_facts_key
+        self._near: Dict[str, NearDuplicateIndex] = {}
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def accept(self, page: "PageContent") -> bool:
+        facts = page_facts_key(page)
+        identity = (page.content_hash, facts)
+        if identity in self._seen_hashes:
+            self.exact_duplicates += 1
+            DUPLICATES_DROPPED.inc("exact")
+            return False
+        self._seen_hashes.add(identity)
+        if self.near_threshold > 0:
+            fingerprint = page.simhash if page.simhash is not None else compute_simhash(page.markdown)
+            if fingerprint is not None:
+                index = self._near.get(facts)
+                if index is None:
+                    index = self._near[facts] = NearDuplicateIndex(self.near_threshold)
+                if index.find(fingerprint) is not None:
+                    self.near_duplicates += 1
+                    DUPLICATES_DROPPED.inc("near")
+                    return False
+                index.add(fingerprint)
+        return True
+
+
 def deduplicate_blocks(lines: List[str], min_block_size: int = 50) -> List[str]:
     """Remove duplicate text blocks."""
     seen_hashes = set()
@@ -585,6 +1092,93 @@ def deduplicate_blocks(lines: List[str], min_block_size: int = 50) -> List[str]:
     return result
 
 
+def split_blocks(lines: List[str]) -> List[List[str]]:
+    """Split lines into heading-delimited blocks, as deduplicate_blocks does:
+    each heading/``---``/``===`` line starts a new block."""
+    blocks: List[List[str]] = []
+    current: List[str] = []
+    for line in lines:
+        if line.startswith('#') or line.startswith('---') or line.startswith('==='):
+            if current:
+                blocks.append(current)
+            current = [line]
+        else:
+            current.append(line)
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+# Fewer pages than this give no meaningful site-wide frequency
+BOILERPLATE_MIN_PAGES = 4
+# Streaming: a block already seen on this many earlier pages is boilerplate
+BOILERPLATE_STREAM_REPEATS = 2
+
+
+class BoilerplateFilter:
+    """Cross-page boilerplate removal driven by one block-frequency index.
+
+    Every heading-delimited block is fingerprinted (content hash) and counted
+    once per page. Blocks found on more than `threshold` of the pages (header,
+    footer, cookie notice, mega-menu...) are stripped from every page. This is
+    language-independent and needs no pairwise page comparison.
+
+    `strip_online` is the streaming variant: pages are seen one by one, so a
+    block is stripped once it has already appeared on
+    BOILERPLATE_STREAM_REPEATS earlier pages.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._page_counts: Counter = Counter()
+        self.blocks_removed = 0
+
+    @staticmethod
+    def _fingerprints(blocks: List[List[str]]) -> List[Optional[str]]:
+        fingerprints: List[Optional[str]] = []
+        for block in blocks:
+            text = ' '.join(line for line in block if line.strip())
+            fingerprints.append(compute_content_hash(text) if text else None)
+        return fingerprints
+
+    def _rebuild(self, page: PageContent, blocks: List[List[str]], keep: List[bool]) -> PageContent:
+        kept = [line for block, k in zip(blocks, keep) if k for line in block]
+        self.blocks_removed += keep.count(False)
+        markdown = re.sub(r"\n{3,}", "\n\n", '\n'.join(kept)).strip()
+        return replace(
+            page,
+            markdown=markdown,
+            content_hash=compute_content_hash(markdown),
+            simhash=compute_simhash(markdown),
+        )
+
+    def strip_all(self, pages: List[PageContent]) -> List[PageContent]:
+        """Batch mode: count blocks over all pages, then strip the frequent ones."""
+        if self.threshold <= 0 or len(pages) < BOILERPLATE_MIN_PAGES:
+            return pages
+        split = [split_blocks(page.markdown.split('\n')) for page in pages]
+        fingerprints = [self._fingerprints(blocks) for blocks in split]
+        for page_fps in fingerprints:
+            self._page_counts.update({fp for fp in page_fps if fp})
+        limit = self.threshold * len(pages)
+
+        result: List[PageContent] = []
+        for page, blocks, page_fps in zip(pages, split, fingerprints):
+            keep = [fp is None or self._page_counts[fp] <= limit for fp in page_fps]
+            result.append(self._rebuild(page, blocks, keep) if not all(keep) else page)
+        return result
+
+    def strip_online(self, page: PageContent) -> PageContent:
+        """Streaming mode: strip blocks already repeated on earlier pages."""
+        if self.threshold <= 0:
+            return page
+        blocks = split_blocks(page.markdown.split('\n'))
+        page_fps = self._fingerprints(blocks)
+        keep = [fp is None or self._page_counts[fp] < BOILERPLATE_STREAM_REPEATS for fp in page_fps]
+        self._page_counts.update({fp for fp in page_fps if fp})
+        return self._rebuild(page, blocks, keep) if not all(keep) else page
+
+
 def remove_consecutive_duplicates(lines: List[str]) -> List[str]:
     """Remove consecutive duplicate lines."""
     if not lines:
@@ -637,90 +1231,134 @@ def remove_menu_list_blocks(lines: List[str]) -> List[str]:
     return result
 
 
-def clean_html_to_markdown(html: str, url: str, max_chars: int) -> Dict[str, Any]:
-    """Enhanced HTML to Markdown conversion with structured data extraction."""
-    soup = BeautifulSoup(html, "html.parser")
+# Markdown is collected only up to this multiple of max_chars (plus a fixed
+# slack) before the cleanup passes, which may drop repeated blocks and menus;
+# if the cleaned text then falls short of max_chars, collection resumes
+MARKDOWN_BUDGET_MARGIN = 1.5
+MARKDOWN_BUDGET_SLACK = 2000
 
-    # Remove non-content elements
-    for tag in soup(["script", "style", "noscript", "svg", "canvas", "form", "iframe"]):
-        tag.decompose()
+# Tags opening a markdown block when found outside any other block
+BLOCK_KINDS = {
+    "h1": "heading", "h2": "heading", "h3": "heading", "h4": "heading", "h5": "heading", "h6": "heading",
+    "p": "paragraph", "pre": "code", "code": "code", "blockquote": "quote",
+}
+LIST_TAGS = frozenset({"ul", "ol"})
+# String types get_text() returns (comments, doctype, template strings... are skipped)
+TEXT_NODE_TYPES = (NavigableString, CData)
 
-    # Extract canonical URL
-    canonical = None
-    canonical_tag = soup.find("link", attrs={"rel": "canonical"})
-    if canonical_tag and canonical_tag.get("href"):
-        canonical = canonical_tag.get("href")
 
-    # Title and meta description
-    title_tag = soup.find("title")
-    title = (title_tag.get_text(strip=True) if title_tag else "") or "Untitled"
-    title = normalize_text(title)
-    
-    meta_desc_tag = soup.find("meta", attrs={"name": "description"}) or soup.find(
-        "meta", attrs={"property": "og:description"}
-    )
-    description = meta_desc_tag.get("content") if meta_desc_tag and meta_desc_tag.get("content") else None
-    if description:
-        description = normalize_text(description)
+@dataclass
+class MarkdownFrame:
+    """A block open during the markdown walk."""
+    kind: str  # heading, paragraph, code, quote, list or item
+    name: str
+    words: List[str] = field(default_factory=list)  # stripped text nodes
+    items: List[str] = field(default_factory=list)  # lists: markdown lines of their items
 
-    # Detect language and page type
-    raw_text = soup.get_text()
-    lang = detect_language(soup, url, raw_text)
-    page_type = detect_page_type(url, title, soup)
 
-    # Simple content containers to prioritize
-    main = soup.find("main") or soup.find("article") or soup.find("body") or soup
+def _flush_list_item(item: MarkdownFrame, parent: MarkdownFrame) -> None:
+    """Turn the text collected so far in `item` into a line of its `parent` list."""
+    text = normalize_text(" ".join(item.words))
+    item.words = []
+    # Filter out navigation items for voice AI
+    if text and not is_navigation_item(text):
+        bullet = "- " if parent.name == "ul" else "1. "
+        parent.items.append(bullet + text)
 
-    # Convert headings, paragraphs, and lists into markdown-like text
-    parts: List[str] = []
-    for element in main.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "p", "ul", "ol", "pre", "code", "blockquote"], recursive=True):
-        # Skip if parent was already processed
-        if element.find_parent(["pre", "code"]):
-            continue
-            
-        name = element.name
-        text = element.get_text(" ", strip=True)
-        if not text:
+
+def _close_block(frame: MarkdownFrame) -> Optional[str]:
+    """Markdown line for a closed heading, paragraph, code or quote block."""
+    text = normalize_text(" ".join(frame.words))
+    if not text:
+        return None
+    # Skip very short isolated phrases (likely CTAs)
+    if frame.kind == "paragraph" and len(text) < 25 and not any(c in text for c in '.,;:!?'):
+        return None
+    # Skip navigation items for voice AI
+    if is_navigation_item(text):
+        return None
+    if frame.kind == "heading":
+        # Skip noise headings
+        return None if is_noise_heading(text) else "#" * int(frame.name[1]) + " " + text
+    if frame.kind == "code":
+        return "```\n" + text + "\n```"
+    if frame.kind == "quote":
+        return "> " + text
+    return text
+
+
+def iter_markdown_parts(main) -> Iterator[str]:
+    """Convert headings, paragraphs, lists, code and quotes under `main` to markdown lines, in document order.
+
+    The tree is walked once and lazily (a caller that stops early skips the
+    rest), visiting each text node once. Open blocks are kept on a stack:
+    text goes to the innermost block and to every enclosing list, whose full
+    text decides whether it is a navigation menu. Tags nested in a block are
+    inline content of that block, except lists inside a list item, whose
+    items follow the item's text.
+    """
+    frames: List[MarkdownFrame] = []
+    # Nodes still to visit, and frames to close once their subtree is done
+    stack: List[Any] = list(reversed(main.contents))
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, MarkdownFrame):
+            frames.pop()
+            if node.kind == "item":
+                _flush_list_item(node, frames[-1])
+            elif node.kind == "list":
+                text = normalize_text(" ".join(node.words))
+                if not text or is_navigation_item(text):
+                    continue
+                if not frames:
+                    yield from node.items
+                else:
+                    # Nested list: its items follow the parent item in the outer list
+                    outer = frames[-2] if frames[-1].kind == "item" else frames[-1]
+                    outer.items.extend(node.items)
+            else:
+                line = _close_block(node)
+                if line is not None:
+                    yield line
             continue
 
-        # Normalize text
-        text = normalize_text(text)
-        
-        # Skip very short isolated phrases (likely CTAs)
-        if name == "p" and len(text) < 25 and not any(c in text for c in '.,;:!?'):
+        if type(node) in TEXT_NODE_TYPES:
+            text = node.strip()
+            if text and frames:
+                for frame in frames:
+                    if frame.kind == "list":
+                        frame.words.append(text)
+                if frames[-1].kind != "list":
+                    frames[-1].words.append(text)
             continue
-        
-        # Skip navigation items for voice AI
-        if is_navigation_item(text):
+
+        name = node.name
+        if name is None:
             continue
+        top = frames[-1] if frames else None
+        frame = None
+        if top is None:
+            if name in LIST_TAGS:
+                frame = MarkdownFrame("list", name)
+            elif name in BLOCK_KINDS:
+                frame = MarkdownFrame(BLOCK_KINDS[name], name)
+        elif top.kind == "list":
+            if name == "li":
+                frame = MarkdownFrame("item", name)
+            elif name in LIST_TAGS:
+                frame = MarkdownFrame("list", name)
+        elif top.kind == "item" and name in LIST_TAGS:
+            _flush_list_item(top, frames[-2])
+            frame = MarkdownFrame("list", name)
+        if frame is not None:
+            frames.append(frame)
+            stack.append(frame)
+        stack.extend(reversed(node.contents))
 
-        if name in {"h1", "h2", "h3", "h4", "h5", "h6"}:
-            level = int(name[1])
-            # Skip noise headings
-            if not is_noise_heading(text):
-                parts.append("#" * level + " " + text)
-        elif name == "p":
-            parts.append(text)
-        elif name in {"ul", "ol"}:
-            list_items = []
-            for li in element.find_all("li", recursive=False):
-                li_text = li.get_text(" ", strip=True)
-                if li_text:
-                    li_text = normalize_text(li_text)
-                    # Filter out navigation items for voice AI
-                    if not is_navigation_item(li_text):
-                        list_items.append(li_text)
-            
-            if list_items:
-                for item in list_items:
-                    bullet = "- " if name == "ul" else "1. "
-                    parts.append(bullet + item)
-        elif name in {"pre", "code"}:
-            parts.append("```\n" + text + "\n```")
-        elif name == "blockquote":
-            parts.append("> " + text)
-
-    # Join and process content
+
+def postprocess_markdown(parts: List[str]) -> str:
+    """Join markdown parts and run the cleanup passes (menus, duplicates, anchors)."""
     content = "\n\n".join(parts)
     content = re.sub(r"\n{3,}", "\n\n", content).strip()
     
@@ -743,7 +1381,79 @@ def clean_html_to_markdown(html: str, url: str, max_chars: int) -> Dict[str, Any
                 continue
         cleaned_lines.append(line)
     
-    content = '\n'.join(cleaned_lines)
+    return '\n'.join(cleaned_lines)
+
+
+def clean_html_to_markdown(html: str, url: str, max_chars: int,
+                           soup: Optional[BeautifulSoup] = None,
+                           timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Enhanced HTML to Markdown conversion with structured data extraction.
+
+    Non-content tags are removed from `soup` in place, so when a shared
+    document is passed this must be the last stage that reads it. Only as
+    much of the page as `max_chars` needs is converted to markdown, while
+    language, contact details and hours still come from the full text.
+    Seconds spent per stage are added to `timings` when given.
+    """
+    if soup is None:
+        soup = parse_html(html)
+
+    # Remove non-content elements
+    for tag in soup(["script", "style", "noscript", "svg", "canvas", "form", "iframe"]):
+        tag.decompose()
+
+    # Extract canonical URL
+    canonical = None
+    canonical_tag = soup.find("link", attrs={"rel": "canonical"})
+    if canonical_tag and canonical_tag.get("href"):
+        canonical = canonical_tag.get("href")
+
+    # Title and meta description
+    title_tag = soup.find("title")
+    title = (title_tag.get_text(strip=True) if title_tag else "") or "Untitled"
+    title = normalize_text(title)
+    
+    meta_desc_tag = soup.find("meta", attrs={"name": "description"}) or soup.find(
+        "meta", attrs={"property": "og:description"}
+    )
+    description = meta_desc_tag.get("content") if meta_desc_tag and meta_desc_tag.get("content") else None
+    if description:
+        description = normalize_text(description)
+
+    # Detect language and page type
+    raw_text = soup.get_text()
+    lang = detect_language(soup, url, raw_text)
+    page_type = detect_page_type(url, title, soup)
+
+    # Simple content containers to prioritize
+    main = soup.find("main") or soup.find("article") or soup.find("body") or soup
+
+    # Convert elements until the character budget is met: the text past
+    # max_chars would be truncated away, so it is neither converted nor cleaned
+    markdown_seconds = 0.0
+    cleanup_seconds = 0.0
+    parts_iter = iter_markdown_parts(main)
+    parts: List[str] = []
+    collected = 0
+    budget = int(max_chars * MARKDOWN_BUDGET_MARGIN) + MARKDOWN_BUDGET_SLACK
+    while True:
+        step_started = time.perf_counter()
+        exhausted = True
+        for part in parts_iter:
+            parts.append(part)
+            collected += len(part) + 2
+            if collected >= budget:
+                exhausted = False
+                break
+        cleanup_started = time.perf_counter()
+        markdown_seconds += cleanup_started - step_started
+        content = postprocess_markdown(parts)
+        cleanup_seconds += time.perf_counter() - cleanup_started
+        if exhausted or len(content) > max_chars:
+            break
+        # Cleanup removed too much (repeated blocks, menus): collect more
+        budget *= 2
+    cleanup_done = time.perf_counter()
     
     # Extract structured data
     contact_info = extract_contact_info(soup, raw_text)
@@ -769,8 +1479,14 @@ def clean_html_to_markdown(html: str, url: str, max_chars: int) -> Dict[str, Any
     if len(content) > max_chars:
         content = content[: max(0, max_chars - 50)].rsplit(" ", 1)[0] + " …"
 
-    # Compute content hash
+    # Compute content hash and near-duplicate fingerprint
     content_hash = compute_content_hash(content)
+    simhash = compute_simhash(content)
+
+    if timings is not None:
+        timings['markdown'] = markdown_seconds
+        timings['cleanup'] = cleanup_seconds
+        timings['structured'] = time.perf_counter() - cleanup_done
 
     return {
         'title': title,
@@ -782,24 +1498,713 @@ def clean_html_to_markdown(html: str, url: str, max_chars: int) -> Dict[str, Any
         'contact_info': contact_info,
         'structured_data': structured_data,
         'content_hash': content_hash,
+        'simhash': simhash,
     }
 
 
-async def fetch_html(client: httpx.AsyncClient, url: str, timeout: float) -> Optional[str]:
-    try:
-        resp = await client.get(url, timeout=timeout, follow_redirects=True)
-        if resp.status_code >= 400:
-            return None
-        if not is_probably_html(resp):
-            return None
-        return resp.text
-    except Exception:
-        return None
+# ============================================================================
+# EXTRACTION EXECUTOR (CPU-BOUND WORK OFF THE EVENT LOOP)
+# ============================================================================
 
+def analyze_page(html: str, url: str, max_chars: int, with_links: bool, detect_js: bool) -> Dict[str, Any]:
+    """Parse a page once and run every CPU-bound stage on it.
 
-async def fetch_text(client: httpx.AsyncClient, url: str, timeout: float) -> Optional[str]:
-    try:
-        resp = await client.get(url, timeout=timeout, follow_redirects=True)
+    Runs inside the extraction executor, so it only takes and returns plain
+    picklable data. When `detect_js` is set and the page looks like an empty
+    SPA shell, returns ``{'js_rendered': True}`` without extracting anything
+    (the caller re-renders with Playwright and calls this again). Seconds
+    spent per stage are returned under ``timings``.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    soup = parse_html(html)
+    parsed = time.perf_counter()
+    timings['parse'] = parsed - started
+    if detect_js:
+        js_rendered = is_js_rendered_site(html, soup)
+        timings['js_detect'] = time.perf_counter() - parsed
+        if js_rendered:
+            return {'js_rendered': True, 'timings': timings}
+
+    # Links are read from the intact document: markdown extraction
+    # strips forms, iframes etc. in place, so it has to run last
+    if with_links:
+        links_started = time.perf_counter()
+        links = extract_link_anchors(html, url, soup)
+        timings['links'] = time.perf_counter() - links_started
+    else:
+        links = []
+    page_data = clean_html_to_markdown(html, url, max_chars, soup=soup, timings=timings)
+    page_data['links'] = links
+    page_data['js_rendered'] = False
+    page_data['timings'] = timings
+    return page_data
+
+
+async def run_analyze_page(html: str, url: str, max_chars: int, with_links: bool,
+                           detect_js: bool) -> Dict[str, Any]:
+    """analyze_page in EXTRACTION_POOL, recording per-stage times in EXTRACT_SECONDS."""
+    started = time.perf_counter()
+    page_data = await EXTRACTION_POOL.run(analyze_page, html, url, max_chars, with_links, detect_js)
+    elapsed = time.perf_counter() - started
+    timings = page_data.pop('timings', {})
+    for stage, seconds in timings.items():
+        EXTRACT_SECONDS.observe(seconds, stage)
+    EXTRACT_SECONDS.observe(max(0.0, elapsed - sum(timings.values())), "queue")
+    return page_data
+
+
+# Default worker count: the CPUs this process may run on, capped because each
+# spawned worker holds its own interpreter (~70 MB) next to Chromium
+EXTRACTION_DEFAULT_MAX_WORKERS = 4
+
+
+def default_extraction_workers() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, EXTRACTION_DEFAULT_MAX_WORKERS))
+
+
+class ExtractionPool:
+    """Executor running HTML extraction off the event loop.
+
+    `mode` is ``process`` (default: a ProcessPoolExecutor, scales across
+    cores), ``thread`` (ThreadPoolExecutor, keeps the loop responsive but
+    shares the GIL) or ``inline`` (run on the loop, as before). If the process
+    pool cannot be created or breaks, the pool falls back to threads. Until
+    start() is called, work runs inline.
+    """
+
+    def __init__(self, mode: str = "process", workers: Optional[int] = None):
+        self.mode = mode
+        self.workers = workers or default_extraction_workers()
+        self.executor: Optional[Executor] = None
+        self.active_mode = "inline"
+        self.tasks = 0
+
+    def start(self) -> None:
+        if self.executor is not None or self.mode == "inline":
+            return
+        if self.mode == "process":
+            try:
+                # spawn: forking a process that runs an event loop and the
+                # Playwright driver threads is not safe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self.active_mode = "process"
+                return
+            except Exception as e:
+                print(f"WARNING: Process pool unavailable ({e}), using threads for extraction")
+        self._start_threads()
+
+    def _start_threads(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self.active_mode = "thread"
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.active_mode = "inline"
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in the executor (inline if none is running)."""
+        self.tasks += 1
+        if self.executor is None:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, functools.partial(fn, *args))
+        except BrokenProcessPool:
+            # Every task awaiting the broken pool gets here: only the first
+            # replaces it, the others retry on the thread pool it started
+            if self.executor is executor:
+                print("WARNING: Extraction process pool broke, falling back to threads")
+                self.close()
+                self._start_threads()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'mode': self.active_mode, 'workers': self.workers, 'tasks': self.tasks}
+
+
+EXTRACTION_POOL = ExtractionPool(
+    mode=os.getenv("EXTRACTION_EXECUTOR", "process"),
+    workers=int(os.getenv("EXTRACTION_WORKERS", "0")) or None,
+)
+
+
+# ============================================================================
+# SHARED HTTP CLIENT (CONNECTION POOL, HTTP/2, DNS CACHE)
+# ============================================================================
+
+DNS_LOOKUPS = METRICS.counter(
+    "mdcrawler_dns_lookups_total", "Host name resolutions by result.", ("result",)
+)
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+class DnsCache:
+    """Addresses returned by getaddrinfo, kept per (host, port) for `ttl` seconds.
+
+    getaddrinfo gives no TTL, so a fixed one is used; an entry is also dropped
+    as soon as none of its addresses accepts a connection. Concurrent lookups
+    of the same host share one resolution. At most `max_entries` hosts are
+    kept (least recently used first out).
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, List[str]]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        key = (host.lower(), port)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            DNS_LOOKUPS.inc("hit")
+            return cached[1]
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._lookup(host, port))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host: str, port: int) -> List[str]:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            self.errors += 1
+            DNS_LOOKUPS.inc("error")
+            raise
+        self.misses += 1
+        DNS_LOOKUPS.inc("miss")
+        # Unique addresses, resolver order kept (it already sorts by preference)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if self.ttl > 0 and addresses:
+            self._entries[(host.lower(), port)] = (time.monotonic() + self.ttl, addresses)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return addresses
+
+    def forget(self, host: str, port: int) -> None:
+        self._entries.pop((host.lower(), port), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+        }
+
+
+# Happy Eyeballs (RFC 8305): start the next address if the previous one has
+# not connected after this long (same delay as anyio.connect_tcp)
+HAPPY_EYEBALLS_DELAY = 0.25
+
+
+def interleave_address_families(addresses: List[str]) -> List[str]:
+    """Alternate IPv6 and IPv4 addresses, starting with the resolver's first choice."""
+    ipv6 = [address for address in addresses if ':' in address]
+    ipv4 = [address for address in addresses if ':' not in address]
+    first, second = (ipv6, ipv4) if addresses and ':' in addresses[0] else (ipv4, ipv6)
+    ordered: List[str] = []
+    for i in range(max(len(first), len(second))):
+        ordered.extend(group[i] for group in (first, second) if i < len(group))
+    return ordered
+
+
+class CachingDnsBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend connecting to addresses from a DnsCache.
+
+    Only name resolution changes: TLS still verifies and sends SNI for the
+    original host name, which httpcore passes separately from the address.
+    Addresses are raced Happy Eyeballs style, as anyio does for a host name,
+    so an unreachable IPv6 address costs HAPPY_EYEBALLS_DELAY, not `timeout`.
+    """
+
+    def __init__(self, dns: DnsCache, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.dns = dns
+        self.backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None):
+        if is_ip_address(host):
+            return await self.backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        try:
+            addresses = await asyncio.wait_for(self.dns.resolve(host, port), timeout)
+        except asyncio.TimeoutError as e:
+            raise httpcore.ConnectTimeout(f"DNS lookup timed out for {host}") from e
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+
+        try:
+            return await self._race(interleave_address_families(addresses), port, timeout,
+                                    local_address, socket_options)
+        except (httpcore.ConnectError, httpcore.ConnectTimeout):
+            # Every address refused: the host may have moved, resolve it again next time
+            self.dns.forget(host, port)
+            raise
+
+    async def _race(self, addresses: List[str], port: int, timeout: Optional[float],
+                    local_address: Optional[str], socket_options):
+        """Connect to the first address that answers; a new attempt starts every
+        HAPPY_EYEBALLS_DELAY seconds, or at once when one fails."""
+        remaining = list(addresses)
+        pending: Set[asyncio.Task] = set()
+        error: Optional[BaseException] = None
+        try:
+            while remaining or pending:
+                if remaining:
+                    pending.add(asyncio.ensure_future(self.backend.connect_tcp(
+                        remaining.pop(0), port, timeout, local_address, socket_options
+                    )))
+                done, pending = await asyncio.wait(
+                    pending, timeout=HAPPY_EYEBALLS_DELAY if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        await task.result().aclose()  # connected at the same time
+                if winner is not None:
+                    return winner
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    await task
+                except BaseException:
+                    continue
+                await task.result().aclose()  # connected while being cancelled
+        raise error or httpcore.ConnectError("No address to connect to")
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+class SharedHttpClient:
+    """One httpx client (connection pool) for every crawl of the process.
+
+    Connections, TLS sessions and DNS answers are reused across crawls;
+    HTTP/2 multiplexes a host's requests over one connection when the
+    server supports it. Per-crawl settings such as the User-Agent are sent
+    as request headers. Until start() is called (scripts, benchmarks),
+    session() hands out a temporary client built the same way.
+    """
+
+    def __init__(self, http2: bool = True, max_connections: int = 200,
+                 max_keepalive_connections: int = 100, keepalive_expiry: float = 30.0,
+                 dns_ttl: float = 300.0):
+        self.http2 = http2 and H2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.dns = DnsCache(dns_ttl)
+        self.client: Optional[httpx.AsyncClient] = None
+        if http2 and not H2_AVAILABLE:
+            print("WARNING: h2 not installed (pip install 'httpx[http2]'), using HTTP/1.1")
+
+    def build(self, limits: Optional[httpx.Limits] = None) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=limits or self.limits)
+        # httpx does not expose httpcore's network_backend option: set it on
+        # the transport's pool, and refuse to run if that pool has changed
+        pool = getattr(transport, "_pool", None)
+        if not isinstance(pool, httpcore.AsyncConnectionPool) or not hasattr(pool, "_network_backend"):
+            raise RuntimeError(
+                f"Cannot install the DNS cache: unexpected transport internals in httpx "
+                f"{httpx.__version__} / httpcore {httpcore.__version__}"
+            )
+        pool._network_backend = CachingDnsBackend(self.dns)
+        return httpx.AsyncClient(transport=transport, headers=DEFAULT_HEADERS)
+
+    def start(self) -> None:
+        if self.client is None:
+            self.client = self.build()
+
+    async def close(self) -> None:
+        if self.client is not None:
+            client, self.client = self.client, None
+            await client.aclose()
+
+    @asynccontextmanager
+    async def session(self, max_connections: Optional[int] = None) -> AsyncIterator[httpx.AsyncClient]:
+        """The shared client, or a temporary one (closed on exit) if not started."""
+        if self.client is not None:
+            yield self.client
+            return
+        limits = None
+        if max_connections:
+            limits = httpx.Limits(max_connections=max_connections,
+                                  max_keepalive_connections=max_connections,
+                                  keepalive_expiry=self.limits.keepalive_expiry)
+        async with self.build(limits) as client:
+            yield client
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.client is not None,
+            'http2': self.http2,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections,
+            'keepalive_expiry_seconds': self.limits.keepalive_expiry,
+            'dns_cache': self.dns.stats(),
+        }
+
+
+HTTP_CLIENT = SharedHttpClient(
+    http2=os.getenv("HTTP2", "1") != "0",
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "200")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "100")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    dns_ttl=float(os.getenv("DNS_CACHE_TTL", "300")),
+)
+
+
+# ============================================================================
+# HTTP RESPONSE CACHE
+# ============================================================================
+
+# Response headers kept with a cached body (the body is stored decoded, so
+# transfer headers like content-encoding/length must not be replayed)
+CACHED_RESPONSE_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'date')
+
+
+def cache_key(url: str) -> str:
+    """Cache key for a URL: fragment removed, scheme and host lowercased."""
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()).geturl()
+
+
+class HttpCache:
+    """Size-bounded on-disk (SQLite) cache of HTTP responses with LRU eviction.
+
+    Entries keep the body, a few headers and the ETag/Last-Modified
+    validators used for conditional revalidation. When the stored bodies
+    exceed `max_bytes`, the least recently used entries are evicted.
+    A `max_bytes` of 0 disables the cache.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB,"
+                " etag TEXT, last_modified TEXT, size INTEGER, stored_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT url, status, headers, body, etag, last_modified FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'url': row[0], 'status': row[1], 'headers': json.loads(row[2]),
+            'body': row[3], 'etag': row[4], 'last_modified': row[5],
+        }
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+
+    def _put(self, key: str, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            previous = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(headers), body, headers.get('etag'),
+                 headers.get('last-modified'), len(body), now, now),
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            self.stores += 1
+            if self._total_bytes > self.max_bytes:
+                # Evict least recently used entries until back under the bound
+                for old_key, size in conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at"
+                ).fetchall():
+                    if self._total_bytes <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    self._total_bytes -= size
+                    self.evictions += 1
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def touch(self, key: str) -> None:
+        await asyncio.to_thread(self._touch, key)
+
+    async def put(self, key: str, resp: httpx.Response, body: Optional[bytes] = None) -> None:
+        """Store a response; pass `body` when it was streamed rather than read."""
+        headers = {k: resp.headers[k] for k in CACHED_RESPONSE_HEADERS if k in resp.headers}
+        content = resp.content if body is None else body
+        await asyncio.to_thread(self._put, key, str(resp.url), resp.status_code, headers, content)
+
+    async def stats(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._stats)
+
+    def _stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+        return {
+            'enabled': self.enabled,
+            'path': self.path,
+            'entries': entries,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale': self.stale,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
+
+
+HTTP_CACHE = HttpCache(
+    path=os.getenv("HTTP_CACHE_PATH", ".cache/http_cache.sqlite3"),
+    max_bytes=int(float(os.getenv("HTTP_CACHE_MAX_MB", "500")) * 1024 * 1024),
+)
+
+
+# Largest body buffered to be stored when a response is streamed
+HTTP_CACHE_MAX_STREAMED_ENTRY = 16 * 1024 * 1024
+
+
+def _conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _response_from_cache(entry: Dict[str, Any]) -> httpx.Response:
+    return httpx.Response(
+        status_code=entry['status'],
+        headers=entry['headers'],
+        content=entry['body'],
+        request=httpx.Request("GET", entry['url']),
+        extensions={'from_cache': True},
+    )
+
+
+async def cached_get(client: httpx.AsyncClient, url: str, timeout: float,
+                     cache_mode: CacheMode = "use",
+                     headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """GET through the on-disk cache.
+
+    With ``use``, a cached copy is revalidated with If-None-Match /
+    If-Modified-Since and served from disk on 304. ``refresh`` always
+    refetches and overwrites the entry; ``bypass`` skips the cache entirely.
+    `headers` are sent on top of the client's own.
+    """
+    cache = HTTP_CACHE if HTTP_CACHE.enabled and cache_mode != "bypass" else None
+    extensions = {'trace': connection_trace()}
+    if cache is None:
+        return await client.get(url, timeout=timeout, follow_redirects=True, headers=headers,
+                                extensions=extensions)
+
+    key = cache_key(url)
+    entry = await cache.get(key) if cache_mode == "use" else None
+    conditional = _conditional_headers(entry)
+
+    resp = await client.get(url, timeout=timeout, follow_redirects=True,
+                            headers={**(headers or {}), **conditional} or None, extensions=extensions)
+    if entry and resp.status_code == 304:
+        cache.hits += 1
+        await cache.touch(key)
+        return _response_from_cache(entry)
+
+    if entry:
+        cache.stale += 1
+    else:
+        cache.misses += 1
+    if resp.status_code == 200:
+        await cache.put(key, resp)
+    return resp
+
+
+@asynccontextmanager
+async def cached_stream(client: httpx.AsyncClient, url: str, timeout: float,
+                        cache_mode: CacheMode = "use", headers: Optional[Dict[str, str]] = None):
+    """Streaming counterpart of cached_get.
+
+    Yields ``(response, chunks)``: `response` carries the status and headers
+    before any body is read, `chunks` iterates over the body. A 304 replays
+    the cached body; a 200 body read to the end (and no larger than
+    HTTP_CACHE_MAX_STREAMED_ENTRY) is stored.
+    """
+    cache = HTTP_CACHE if HTTP_CACHE.enabled and cache_mode != "bypass" else None
+    key = cache_key(url)
+    entry = await cache.get(key) if cache is not None and cache_mode == "use" else None
+    conditional = _conditional_headers(entry)
+
+    async with client.stream("GET", url, timeout=timeout, follow_redirects=True,
+                             headers={**(headers or {}), **conditional} or None,
+                             extensions={'trace': connection_trace()}) as resp:
+        if entry and resp.status_code == 304:
+            cache.hits += 1
+            await cache.touch(key)
+
+            async def replay():
+                yield entry['body']
+
+            yield _response_from_cache(entry), replay()
+            return
+
+        if cache is not None:
+            if entry:
+                cache.stale += 1
+            else:
+                cache.misses += 1
+        if cache is None or resp.status_code != 200:
+            yield resp, resp.aiter_bytes()
+            return
+
+        buffer: Optional[bytearray] = bytearray()
+        complete = False
+
+        async def tee():
+            nonlocal buffer, complete
+            async for chunk in resp.aiter_bytes():
+                if buffer is not None:
+                    buffer.extend(chunk)
+                    if len(buffer) > HTTP_CACHE_MAX_STREAMED_ENTRY:
+                        buffer = None
+                yield chunk
+            complete = True
+
+        yield resp, tee()
+        if complete and buffer is not None:
+            await cache.put(key, resp, bytes(buffer))
+
+
+async def fetch_html(client: httpx.AsyncClient, url: str, timeout: float,
+                     cache_mode: CacheMode = "use", max_bytes: Optional[int] = None,
+                     headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """GET an HTML page, streaming the body.
+
+    Status and content type are checked before any of the body is read, so
+    PDFs, videos or archives are abandoned without downloading them. At most
+    `max_bytes` of the body are read: a longer page is cut to that prefix.
+    """
+    started = time.perf_counter()
+    label = host_class(url)
+    outcome = "error"
+    try:
+        async with cached_stream(client, url, timeout, cache_mode, headers) as (resp, chunks):
+            from_cache = resp.extensions.get('from_cache', False)
+            try:
+                if resp.status_code >= 400:
+                    outcome = "http_error"
+                    return None
+                if not is_probably_html(resp):
+                    outcome = "not_html"
+                    return None
+                body = bytearray()
+                truncated = False
+                async for chunk in chunks:
+                    body.extend(chunk)
+                    if max_bytes and len(body) >= max_bytes:
+                        truncated = len(body) > max_bytes
+                        del body[max_bytes:]
+                        break
+                outcome = "cached" if from_cache else "truncated" if truncated else "ok"
+                # A prefix may end inside a multi-byte character
+                return body.decode(resp.encoding or "utf-8", errors="replace")
+            finally:
+                if not from_cache:
+                    FETCH_BYTES.observe(resp.num_bytes_downloaded, label)
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        return None
+    except Exception:
+        return None
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - started, label, outcome)
+
+
+async def fetch_text(client: httpx.AsyncClient, url: str, timeout: float,
+                     cache_mode: CacheMode = "use",
+                     headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+    try:
+        resp = await cached_get(client, url, timeout, cache_mode, headers)
         if resp.status_code >= 400:
             return None
         return resp.text
@@ -807,23 +2212,26 @@ async def fetch_text(client: httpx.AsyncClient, url: str, timeout: float) -> Opt
         return None
 
 
-def is_js_rendered_site(html: str) -> bool:
-    """Detect if a site is JavaScript-rendered (SPA) with minimal content."""
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # Remove script and style tags
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
+def is_js_rendered_site(html: str, soup: Optional[BeautifulSoup] = None) -> bool:
+    """Detect if a site is JavaScript-rendered (SPA) with minimal content.
+
+    Read-only on `soup`: script/style/noscript text is skipped, not decomposed.
+    """
+    if soup is None:
+        soup = parse_html(html)
     
     # Check if body has minimal text content
     body = soup.find("body")
     if not body:
         return True
     
-    text = body.get_text(strip=True)
+    # get_text() already ignores script/style strings; discount <noscript> too
+    text_length = len(body.get_text(strip=True)) - sum(
+        len(tag.get_text(strip=True)) for tag in body.find_all("noscript")
+    )
     
     # If body has very little text (< 100 chars), likely JS-rendered
-    if len(text) < 100:
+    if text_length < 100:
         return True
     
     # Check for common SPA indicators
@@ -840,394 +2248,1929 @@ def is_js_rendered_site(html: str) -> bool:
     html_lower = html.lower()
     if any(indicator.lower() in html_lower for indicator in spa_indicators):
         # Has SPA indicator, check if there's actual content
-        if len(text) < 500:  # Very little rendered content
+        if text_length < 500:  # Very little rendered content
             return True
     
     return False
 
 
-async def fetch_html_with_js(url: str, timeout: float, user_agent: str) -> Optional[str]:
-    """Fetch HTML using Playwright for JavaScript-rendered sites."""
-    if not PLAYWRIGHT_AVAILABLE:
-        print("WARNING: Playwright not available, skipping JS rendering")
+# ============================================================================
+# BROWSER POOL (JS RENDERING)
+# ============================================================================
+
+BROWSER_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--no-sandbox',  # Required for Docker/Railway
+    '--disable-dev-shm-usage'  # Overcome limited resource problems
+]
+
+# How often (seconds) the pool samples browser memory before recycling
+BROWSER_RSS_CHECK_INTERVAL = 5.0
+
+
+# Argument identifying the Playwright driver (node) among our child processes
+PLAYWRIGHT_DRIVER_ARG = b"run-driver"
+
+
+def browser_processes_rss_mb() -> Optional[float]:
+    """Resident memory (MB) of the Playwright driver and its descendants (Chromium).
+
+    Other children of the server, such as the extraction workers, are not
+    counted. Linux only (reads /proc); returns None when unavailable.
+    """
+    if not os.path.isdir('/proc'):
         return None
-    
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--no-sandbox',  # Required for Docker/Railway
-                    '--disable-dev-shm-usage'  # Overcome limited resource problems
-                ]
-            )
-            context = await browser.new_context(
-                user_agent=user_agent,
-                viewport={'width': 1920, 'height': 1080},
-                ignore_https_errors=True
-            )
-            page = await context.new_page()
-            
-            # Try different loading strategies
+        parents: Dict[int, int] = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
             try:
-                # First try: wait for DOM content loaded (faster, more reliable for SPAs)
-                await page.goto(url, wait_until='domcontentloaded', timeout=timeout * 1000)
-            except Exception:
-                # Fallback: just navigate without waiting
-                await page.goto(url, wait_until='commit', timeout=timeout * 1000)
-            
-            # Wait for content to render (dynamic wait)
+                with open(f'/proc/{entry}/stat') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # Fields after the command name, which may contain spaces
+            fields = stat.rsplit(')', 1)[-1].split()
+            parents[int(entry)] = int(fields[1])
+
+        frontier = []
+        server_pid = os.getpid()
+        for pid, parent in parents.items():
+            if parent != server_pid:
+                continue
             try:
-                # Wait for body to have some content
-                await page.wait_for_function(
-                    "document.body && document.body.innerText.length > 100",
-                    timeout=5000
-                )
-            except Exception:
-                # If that fails, just wait a fixed time
-                await page.wait_for_timeout(3000)
-            
-            # Scroll to trigger lazy loading
+                with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                    if PLAYWRIGHT_DRIVER_ARG in f.read().split(b'\0'):
+                        frontier.append(pid)
+            except OSError:
+                continue
+
+        tree: Set[int] = set(frontier)
+        while frontier:
+            pid = frontier.pop()
+            for child, parent in parents.items():
+                if parent == pid and child not in tree:
+                    tree.add(child)
+                    frontier.append(child)
+
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        total = 0
+        for pid in tree:
             try:
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await page.wait_for_timeout(1000)
-            except Exception:
-                pass
-            
-            # Get the rendered HTML
-            html = await page.content()
-            
-            await browser.close()
-            return html
-    except Exception as e:
-        print(f"Playwright error for {url}: {e}")
+                with open(f'/proc/{pid}/statm') as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                continue
+        return total / (1024 * 1024)
+    except Exception:
         return None
 
 
-async def discover_sitemap_urls(
-    client: httpx.AsyncClient,
-    start_url: str,
-    explicit_sitemap_url: Optional[str],
-    timeout: float,
-    same_domain_only: bool,
-    max_urls: int,
-) -> List[str]:
-    from urllib.parse import urlunparse
-    import xml.etree.ElementTree as ET
-
-    parsed = urlparse(start_url)
-    base_root = f"{parsed.scheme}://{parsed.netloc}"
+class BrowserPool:
+    """Process-wide Chromium pool shared by every crawl.
 
-    candidates: List[str] = []
-    if explicit_sitemap_url:
-        candidates.append(explicit_sitemap_url)
-    # robots.txt discovery
-    robots_url = base_root + "/robots.txt"
-    robots = await fetch_text(client, robots_url, timeout)
-    if robots:
-        for line in robots.splitlines():
-            line = line.strip()
-            if line.lower().startswith("sitemap:"):
-                sm = line.split(":", 1)[1].strip()
-                sm_norm = normalize_url(sm, base_root)
-                if sm_norm:
-                    candidates.append(sm_norm)
-    # default location
-    candidates.append(base_root + "/sitemap.xml")
+    A single warm browser hands out isolated contexts (one per render). Renders
+    are capped by the pool's own semaphore, independent of the per-crawl HTTP
+    concurrency. The browser is recycled after `max_pages_per_browser` renders
+    or when the browser processes exceed `max_rss_mb`; a retired browser is
+    closed once its in-flight renders are done.
+    """
 
-    seen: Set[str] = set()
-    discovered: List[str] = []
+    def __init__(self, max_concurrent_renders: int = 3, max_pages_per_browser: int = 100,
+                 max_rss_mb: Optional[float] = None):
+        self.max_concurrent_renders = max_concurrent_renders
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_rss_mb = max_rss_mb
+        self._semaphore = asyncio.Semaphore(max_concurrent_renders)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_pages = 0
+        self._in_flight: Dict[Any, int] = {}
+        self._retiring: Set[Any] = set()
+        self._last_rss_check = 0.0
+        # Usage counters reported by stats()
+        self.waiting = 0
+        self.active_renders = 0
+        self.total_renders = 0
+        self.failed_launches = 0
+        self.browsers_launched = 0
+        self.browsers_recycled = 0
+        self.last_rss_mb: Optional[float] = None
 
-    async def parse_sitemap(sitemap_url: str) -> None:
-        nonlocal discovered
-        xml_text = await fetch_text(client, sitemap_url, timeout)
-        if not xml_text:
+    async def start(self) -> None:
+        """Launch the shared browser ahead of the first render (best effort)."""
+        if not PLAYWRIGHT_AVAILABLE:
+            print("WARNING: Playwright not available, browser pool disabled")
             return
         try:
-            root = ET.fromstring(xml_text)
-        except Exception:
-            return
-        tag = root.tag.lower()
-        # Handle namespaces by stripping them
-        def strip_ns(t: str) -> str:
-            return t.split('}', 1)[-1] if '}' in t else t
-        root_name = strip_ns(root.tag).lower()
-        if root_name == "sitemapindex":
-            for sm in root:
-                if strip_ns(sm.tag).lower() == "sitemap":
-                    loc_el = next((c for c in sm if strip_ns(c.tag).lower() == "loc"), None)
-                    if loc_el is not None and loc_el.text:
-                        sm_url = normalize_url(loc_el.text.strip(), sitemap_url)
-                        if sm_url and sm_url not in seen:
-                            seen.add(sm_url)
-                            if len(discovered) < max_urls:
-                                await parse_sitemap(sm_url)
-        elif root_name == "urlset":
-            for url_el in root:
-                if strip_ns(url_el.tag).lower() == "url":
-                    loc_el = next((c for c in url_el if strip_ns(c.tag).lower() == "loc"), None)
-                    if loc_el is not None and loc_el.text:
-                        page_url = normalize_url(loc_el.text.strip(), sitemap_url)
-                        if not page_url:
-                            continue
-                        if same_domain_only and not same_registered_domain(start_url, page_url):
-                            continue
-                        if page_url not in discovered:
-                            discovered.append(page_url)
-                            if len(discovered) >= max_urls:
-                                return
-
-    for cand in candidates:
-        if cand in seen:
-            continue
-        seen.add(cand)
-        if len(discovered) >= max_urls:
-            break
-        await parse_sitemap(cand)
+            async with self._lock:
+                await self._ensure_browser()
+        except Exception as e:
+            print(f"WARNING: Could not start browser pool: {e}")
 
-    return discovered[:max_urls]
+    async def close(self) -> None:
+        async with self._lock:
+            browsers = set(self._in_flight) | ({self._browser} if self._browser else set())
+            self._browser = None
+            for browser in browsers:
+                await self._close_browser(browser)
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except Exception:
+                    pass
+                self._playwright = None
+
+    async def _ensure_browser(self):
+        """Return the current browser, launching one if needed. Caller holds the lock."""
+        if self._browser is not None and not self._browser.is_connected():
+            # Crashed browser: drop it, the next launch replaces it
+            await self._retire(self._browser)
+            self._browser = None
+        if self._browser is None:
+            try:
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True, args=BROWSER_LAUNCH_ARGS
+                )
+            except Exception:
+                self.failed_launches += 1
+                raise
+            self._browser_pages = 0
+            self._in_flight[self._browser] = 0
+            self.browsers_launched += 1
+        return self._browser
 
+    def _needs_recycle(self) -> bool:
+        if self._browser_pages >= self.max_pages_per_browser:
+            return True
+        if self.max_rss_mb:
+            now = time.monotonic()
+            if now - self._last_rss_check >= BROWSER_RSS_CHECK_INTERVAL:
+                self._last_rss_check = now
+                self.last_rss_mb = browser_processes_rss_mb()
+                if self.last_rss_mb is not None and self.last_rss_mb > self.max_rss_mb:
+                    return True
+        return False
 
-async def crawl(request: CrawlRequest) -> List[PageContent]:
-    headers = dict(DEFAULT_HEADERS)
-    if request.user_agent:
-        headers["User-Agent"] = request.user_agent
+    async def _retire(self, browser) -> None:
+        self._retiring.add(browser)
+        if self._in_flight.get(browser, 0) == 0:
+            await self._close_browser(browser)
 
-    exclude_patterns: List[re.Pattern] = []
-    if request.exclude_patterns:
-        exclude_patterns = [re.compile(p, re.IGNORECASE) for p in request.exclude_patterns]
+    async def _close_browser(self, browser) -> None:
+        self._retiring.discard(browser)
+        self._in_flight.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
 
-    start_url = str(request.url)
-    visited: Set[str] = set()
-    seeds: List[str] = [start_url]
-    results: List[PageContent] = []
-    
-    # Semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(request.max_concurrent)
-    # Lock for thread-safe visited set operations
-    visited_lock = asyncio.Lock()
-    user_agent = request.user_agent or DEFAULT_HEADERS["User-Agent"]
+    @asynccontextmanager
+    async def page(self, user_agent: str):
+        """Yield a fresh page in its own browser context, within the render limit."""
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwright not available")
 
-    async def process_page(
-        client: httpx.AsyncClient,
-        url: str,
-        depth: int,
-        visited_set: Set[str],
-        results_list: List[PageContent],
-        queue: Deque[Tuple[str, int]],
-    ) -> Optional[PageContent]:
-        """Process a single page - can be called in parallel."""
-        async with semaphore:
-            # Check and mark as visited atomically
-            async with visited_lock:
-                if url in visited_set:
-                    return None
-                visited_set.add(url)
-            
-            # Validate URL
-            if request.same_domain and not same_registered_domain(start_url, url):
-                return None
-            
-            if any(p.search(url) for p in exclude_patterns):
-                return None
-            
-            # Try static HTML first (fast)
-            html = await fetch_html(client, url, request.timeout)
-            
-            # Check if JS rendering is needed
-            if html and request.use_js_rendering and is_js_rendered_site(html):
-                # Retry with Playwright for JS-rendered content
-                html_js = await fetch_html_with_js(url, request.timeout, user_agent)
-                if html_js:
-                    html = html_js
-            
-            if not html:
-                return None
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
 
-            # Extract enhanced data (CPU-bound, but fast)
-            page_data = clean_html_to_markdown(html, url, request.max_chars_per_page)
-            
-            # Create PageContent with all metadata
-            page_content = PageContent(
-                url=url,
-                title=page_data['title'],
-                description=page_data['description'],
-                markdown=page_data['markdown'],
-                crawled_at=datetime.utcnow().isoformat() + 'Z',
-                page_type=page_data['page_type'],
-                lang=page_data['lang'],
-                canonical_url=page_data.get('canonical_url'),
-                contact_info=page_data.get('contact_info', {}),
-                structured_data=page_data.get('structured_data', {}),
-                content_hash=page_data.get('content_hash', ''),
-            )
-            
-            # Add links to queue for next depth level (thread-safe)
-            if depth < request.depth:
-                links = extract_links(html, url)
-                async with visited_lock:
-                    for link in links:
-                        if link not in visited_set:
-                            queue.append((link, depth + 1))
-            
-            # Rate limiting delay
-            if request.rate_limit_delay > 0:
-                await asyncio.sleep(request.rate_limit_delay)
-            
-            return page_content
+        try:
+            async with self._lock:
+                if self._browser is not None and self._needs_recycle():
+                    old_browser = self._browser
+                    self._browser = None
+                    self.browsers_recycled += 1
+                    await self._retire(old_browser)
+                browser = await self._ensure_browser()
+                self._in_flight[browser] += 1
+                self._browser_pages += 1
+                self.total_renders += 1
 
-    async with httpx.AsyncClient(headers=headers, limits=httpx.Limits(max_connections=request.max_concurrent * 2, max_keepalive_connections=request.max_concurrent)) as client:
-        # Optional sitemap discovery to broaden initial queue
-        if request.use_sitemap:
+            self.active_renders += 1
+            context = None
             try:
-                sitemap_urls = await discover_sitemap_urls(
-                    client=client,
-                    start_url=start_url,
-                    explicit_sitemap_url=request.sitemap_url,
-                    timeout=request.timeout,
-                    same_domain_only=request.same_domain,
-                    max_urls=min(request.max_pages * 5, request.sitemap_max_urls),
+                context = await browser.new_context(
+                    user_agent=user_agent,
+                    viewport={'width': 1920, 'height': 1080},
+                    ignore_https_errors=True
                 )
-                # prioritize homepage first
-                for u in sitemap_urls:
-                    if u not in seeds:
-                        seeds.append(u)
-            except Exception:
-                pass
+                yield await context.new_page()
+            finally:
+                self.active_renders -= 1
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                async with self._lock:
+                    if browser in self._in_flight:
+                        self._in_flight[browser] -= 1
+                    if browser in self._retiring and self._in_flight.get(browser, 0) == 0:
+                        await self._close_browser(browser)
+        finally:
+            self._semaphore.release()
 
-        queue: Deque[Tuple[str, int]] = deque((u, 0) for u in seeds)
-        
-        # Process pages in parallel batches
-        while queue and len(results) < request.max_pages:
-            # Collect a batch of URLs to process in parallel
-            batch: List[Tuple[str, int]] = []
-            while queue and len(batch) < request.max_concurrent and len(results) + len(batch) < request.max_pages:
-                url, depth = queue.popleft()
-                if url not in visited:
-                    batch.append((url, depth))
-            
-            if not batch:
-                break
-            
-            # Process batch in parallel
-            tasks = [
-                process_page(client, url, depth, visited, results, queue)
-                for url, depth in batch
-            ]
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Collect successful results
-            for result in batch_results:
-                if isinstance(result, PageContent):
-                    results.append(result)
-                elif isinstance(result, Exception):
-                    # Log but continue
-                    print(f"Error processing page: {result}")
+    def browsers_alive(self) -> int:
+        return len(self._in_flight)
 
-    return results
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'playwright_available': PLAYWRIGHT_AVAILABLE,
+            'browser_running': self._browser is not None and self._browser.is_connected(),
+            'max_concurrent_renders': self.max_concurrent_renders,
+            'active_renders': self.active_renders,
+            'waiting_renders': self.waiting,
+            'total_renders': self.total_renders,
+            'pages_on_current_browser': self._browser_pages,
+            'max_pages_per_browser': self.max_pages_per_browser,
+            'browsers_launched': self.browsers_launched,
+            'browsers_recycled': self.browsers_recycled,
+            'browsers_retiring': len(self._retiring),
+            'failed_launches': self.failed_launches,
+            'rss_mb': round(self.last_rss_mb, 1) if self.last_rss_mb is not None else None,
+            'max_rss_mb': self.max_rss_mb,
+        }
 
 
-def aggregate_markdown(start_url: str, req: CrawlRequest, pages: List[PageContent], user_agent: str) -> str:
-    """Generate clean, simple output optimized for voice AI reading."""
+BROWSER_POOL = BrowserPool(
+    max_concurrent_renders=int(os.getenv("RENDER_MAX_CONCURRENT", "3")),
+    max_pages_per_browser=int(os.getenv("BROWSER_MAX_PAGES", "100")),
+    max_rss_mb=float(os.getenv("BROWSER_MAX_RSS_MB", "1500")) or None,
+)
+
+
+# Analytics, tag managers and ad networks: never needed for the page text
+TRACKER_HOSTS = frozenset({
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com', 'googlesyndication.com',
+    'doubleclick.net', 'adservice.google.com', 'connect.facebook.net', 'facebook.net',
+    'hotjar.com', 'hotjar.io', 'clarity.ms', 'bat.bing.com', 'snap.licdn.com', 'px.ads.linkedin.com',
+    'analytics.tiktok.com', 'static.ads-twitter.com', 'segment.io', 'cdn.segment.com', 'mixpanel.com',
+    'amplitude.com', 'fullstory.com', 'heapanalytics.com', 'mouseflow.com', 'crazyegg.com',
+    'newrelic.com', 'nr-data.net', 'matomo.cloud', 'hs-analytics.net', 'hs-banner.com', 'track.hubspot.com',
+    'criteo.com', 'criteo.net', 'taboola.com', 'outbrain.com', 'adnxs.com', 'amazon-adsystem.com',
+    'scorecardresearch.com', 'quantserve.com', 'mc.yandex.ru', 'adform.net',
+    'smartadserver.com', 'pubmatic.com', 'rubiconproject.com', 'casalemedia.com', 'teads.tv',
+})
+
+# Typical transfer size per resource type (HTTP Archive medians, rounded),
+# used to estimate the bytes saved by a blocked request
+TYPICAL_RESOURCE_BYTES = {
+    'image': 20_000, 'media': 300_000, 'font': 30_000, 'stylesheet': 15_000, 'script': 25_000,
+}
+DEFAULT_RESOURCE_BYTES = 5_000
+
+
+def host_matches(host: str, hosts: Set[str]) -> bool:
+    """True if `host` or one of its parent domains is in `hosts`."""
+    labels = host.split('.')
+    return any('.'.join(labels[i:]) in hosts for i in range(len(labels) - 1))
+
+
+def request_blocker(blocking: RenderBlocking) -> Callable[[Any], Awaitable[None]]:
+    """Playwright route handler aborting the requests `blocking` rules out."""
+    resource_types = set(blocking.resource_types)
+    if blocking.block_stylesheets:
+        resource_types.add('stylesheet')
+    hosts = {h.lower() for h in blocking.blocked_hosts}
+    if blocking.block_trackers:
+        hosts |= TRACKER_HOSTS
+
+    async def handle(route) -> None:
+        request = route.request
+        resource_type = request.resource_type
+        reason = None
+        if resource_type in resource_types:
+            reason = 'resource_type'
+        elif hosts and host_matches((urlsplit(request.url).hostname or '').lower(), hosts):
+            reason = 'host'
+        if reason is None:
+            await route.continue_()
+            return
+        RENDER_BLOCKED_REQUESTS.inc(reason, resource_type)
+        RENDER_BLOCKED_BYTES.inc(reason, resource_type,
+                                 amount=TYPICAL_RESOURCE_BYTES.get(resource_type, DEFAULT_RESOURCE_BYTES))
+        await route.abort('blockedbyclient')
+
+    return handle
+
+
+# Render completion: the page is done once the DOM has not changed for
+# RENDER_DOM_QUIET_MS and no request has been in flight for RENDER_NETWORK_IDLE_MS.
+# Long-polling or analytics beacons never go idle, so a DOM quiet for
+# RENDER_STALLED_MS with at most RENDER_STALLED_MAX_REQUESTS in flight also counts.
+RENDER_POLL_MS = 50
+RENDER_DOM_QUIET_MS = 300
+RENDER_NETWORK_IDLE_MS = 300
+RENDER_STALLED_MS = 1500
+RENDER_STALLED_MAX_REQUESTS = 2
+# Incremental scrolling stops after this many viewports or once a scroll adds nothing
+RENDER_MAX_SCROLL_STEPS = 20
+
+# Installed before any page script runs: records the time of the last DOM mutation
+RENDER_OBSERVER_SCRIPT = """
+(() => {
+  const state = window.__mdcrawlerRender = {lastMutation: performance.now()};
+  new MutationObserver(() => { state.lastMutation = performance.now(); })
+    .observe(document, {childList: true, subtree: true, characterData: true, attributes: false});
+})();
+"""
+RENDER_STATE_SCRIPT = """
+() => {
+  const state = window.__mdcrawlerRender;
+  const body = document.body;
+  return {
+    quietMs: state ? performance.now() - state.lastMutation : 0,
+    height: body ? body.scrollHeight : 0,
+    bottom: window.scrollY + window.innerHeight,
+  };
+}
+"""
+
+
+class NetworkTracker:
+    """Count a page's requests in flight and when that count last changed."""
+
+    def __init__(self, page):
+        self.in_flight = 0
+        self.last_change = time.monotonic()
+        page.on("request", self._started)
+        page.on("requestfinished", self._ended)
+        page.on("requestfailed", self._ended)
+
+    def _started(self, request) -> None:
+        self.in_flight += 1
+        self.last_change = time.monotonic()
+
+    def _ended(self, request) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self.last_change = time.monotonic()
+
+    def idle_ms(self) -> float:
+        return (time.monotonic() - self.last_change) * 1000 if self.in_flight == 0 else 0.0
+
+
+async def wait_for_render(page, network: NetworkTracker, deadline: float) -> Dict[str, Any]:
+    """Poll until the DOM settles and the network is idle, or until `deadline`."""
+    while True:
+        try:
+            state = await page.evaluate(RENDER_STATE_SCRIPT)
+        except Exception:
+            # Client-side navigation replaced the document: not settled yet
+            state = {'quietMs': 0.0, 'height': 0, 'bottom': 0}
+        dom_quiet = state['quietMs']
+        if dom_quiet >= RENDER_DOM_QUIET_MS and network.idle_ms() >= RENDER_NETWORK_IDLE_MS:
+            return state
+        if dom_quiet >= RENDER_STALLED_MS and network.in_flight <= RENDER_STALLED_MAX_REQUESTS:
+            return state
+        if time.monotonic() + RENDER_POLL_MS / 1000 >= deadline:
+            return state
+        await asyncio.sleep(RENDER_POLL_MS / 1000)
+
+
+async def scroll_for_lazy_content(page, network: NetworkTracker, deadline: float,
+                                  state: Dict[str, Any]) -> None:
+    """Scroll one viewport at a time while scrolling keeps adding content."""
+    for _ in range(RENDER_MAX_SCROLL_STEPS):
+        if time.monotonic() >= deadline:
+            return
+        height = state['height']
+        at_bottom = state['bottom'] >= height
+        await page.evaluate("window.scrollBy(0, window.innerHeight)")
+        state = await wait_for_render(page, network, deadline)
+        if at_bottom and state['height'] <= height:
+            return
+
+
+async def fetch_html_with_js(url: str, timeout: float, user_agent: str,
+                             blocking: Optional[RenderBlocking] = None,
+                             budget: Optional[float] = None, scroll: bool = True) -> Optional[str]:
+    """Fetch HTML using Playwright for JavaScript-rendered sites.
+
+    Returns as soon as the DOM stops changing and the network is idle, or
+    when the render `budget` (seconds, default `timeout`) runs out. With
+    `scroll`, the page is then scrolled until lazy loading adds nothing.
+    Requests ruled out by `blocking` (images, fonts, trackers...) are aborted.
+    """
+    if not PLAYWRIGHT_AVAILABLE:
+        print("WARNING: Playwright not available, skipping JS rendering")
+        return None
     
-    # Deduplicate pages by content hash
-    seen_hashes = set()
-    unique_pages = []
-    for page in pages:
-        if page.content_hash not in seen_hashes:
-            seen_hashes.add(page.content_hash)
-            unique_pages.append(page)
+    started = time.perf_counter()
+    outcome = "error"
+    budget = min(budget or timeout, timeout)
+    try:
+        async with BROWSER_POOL.page(user_agent) as page:
+            # The budget starts once a browser slot is granted
+            deadline = time.monotonic() + budget
+            if blocking is not None and blocking.enabled:
+                await page.route("**/*", request_blocker(blocking))
+            await page.add_init_script(RENDER_OBSERVER_SCRIPT)
+            network = NetworkTracker(page)
+
+            try:
+                await page.goto(url, wait_until='domcontentloaded', timeout=budget * 1000)
+            except PlaywrightTimeoutError:
+                # Slow document: keep whatever has been parsed so far
+                outcome = "budget_exhausted"
+
+            if outcome != "budget_exhausted":
+                state = await wait_for_render(page, network, deadline)
+                if scroll:
+                    await scroll_for_lazy_content(page, network, deadline, state)
+                outcome = "ok" if time.monotonic() < deadline else "budget_exhausted"
+
+            # Get the rendered HTML
+            return await page.content()
+    except Exception as e:
+        outcome = "error"
+        print(f"Playwright error for {url}: {e}")
+        return None
+    finally:
+        RENDER_SECONDS.observe(time.perf_counter() - started, host_class(url), outcome)
+
+
+# A host's render mode is learned after this many consecutive pages agree,
+# and re-detected on every RENDER_MODE_RECHECK_INTERVAL-th page after that
+RENDER_MODE_CONFIRMATIONS = 3
+RENDER_MODE_RECHECK_INTERVAL = 25
+
+
+class HostRenderModes:
+    """Per-crawl memo of each host's render mode ("static" or "js").
+
+    Until a host's last `confirmations` detections agree, every page goes
+    through the static fetch and SPA detection. Once they do, decide()
+    returns the learned mode so the crawler fetches with the right tool
+    directly, except every `recheck_interval` pages, which are detected
+    again; a disagreeing detection restarts the learning.
+    """
+
+    def __init__(self, confirmations: int = RENDER_MODE_CONFIRMATIONS,
+                 recheck_interval: int = RENDER_MODE_RECHECK_INTERVAL):
+        self.confirmations = confirmations
+        self.recheck_interval = recheck_interval
+        # host -> [mode of the current streak, streak length, pages decided from the memo]
+        self._hosts: Dict[str, List[Any]] = {}
+
+    def decide(self, url: str) -> Optional[str]:
+        """Learned mode for `url`'s host, or None when the page must be detected."""
+        entry = self._hosts.get(host_key(url))
+        if entry is None or entry[1] < self.confirmations:
+            return None
+        entry[2] += 1
+        if entry[2] % self.recheck_interval == 0:
+            return None
+        return entry[0]
+
+    def record(self, url: str, mode: str) -> None:
+        """Record the mode detected on a page."""
+        entry = self._hosts.setdefault(host_key(url), [mode, 0, 0])
+        if entry[0] == mode:
+            entry[1] += 1
+        else:
+            entry[0], entry[1], entry[2] = mode, 1, 0
+
+
+# ============================================================================
+# SITEMAP DISCOVERY
+# ============================================================================
+
+# Child sitemaps fetched at the same time
+SITEMAP_FETCH_CONCURRENCY = 4
+# Protocol limit for an uncompressed sitemap (also guards against gzip bombs)
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+# Largest piece of a gzip sitemap inflated at once
+SITEMAP_INFLATE_CHUNK = 1024 * 1024
+
+
+@dataclass
+class SitemapEntry:
+    url: str
+    lastmod: Optional[str] = None
+    priority: Optional[float] = None
+    changefreq: Optional[str] = None
+
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from a tag name."""
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+async def read_sitemap(
+    client: httpx.AsyncClient,
+    sitemap_url: str,
+    timeout: float,
+    cache_mode: CacheMode,
+    accept_url: Callable[[str], bool],
+    max_urls: int,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[List[SitemapEntry], List[str]]:
+    """Stream one sitemap (plain or gzip) and parse it incrementally.
+
+    Returns (page entries, child sitemap URLs). Parsing stops once `max_urls`
+    entries were collected; elements are cleared as soon as they are read,
+    so memory does not grow with the sitemap size.
+    """
+    entries: List[SitemapEntry] = []
+    children: List[str] = []
+    seen_urls: Set[str] = set()
+    try:
+        async with cached_stream(client, sitemap_url, timeout, cache_mode, headers) as (resp, chunks):
+            if resp.status_code >= 400:
+                return entries, children
+            parser = ET.XMLPullParser(events=("start", "end"))
+            size = 0
+            root = None
+            fields: Dict[str, str] = {}
+            # Element depth: 1 for <url>/<sitemap>, 2 for their fields. Nested
+            # extension elements (<image:loc>, <video:...>) are deeper and ignored.
+            depth = 0
+
+            async def xml_pieces():
+                """The body, gunzipped when needed, at most SITEMAP_INFLATE_CHUNK at a time."""
+                decompressor = None
+                first_chunk = True
+                async for chunk in chunks:
+                    if first_chunk:
+                        first_chunk = False
+                        # .xml.gz sitemaps are served as gzip files, not content-encoded
+                        if chunk[:2] == b'\x1f\x8b':
+                            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    if decompressor is None:
+                        yield chunk
+                        continue
+                    # Bounded output per call: a small chunk of a gzip bomb
+                    # cannot inflate past the size check below
+                    while chunk:
+                        piece = decompressor.decompress(chunk, SITEMAP_INFLATE_CHUNK)
+                        chunk = decompressor.unconsumed_tail
+                        if piece:
+                            yield piece
+
+            async for chunk in xml_pieces():
+                size += len(chunk)
+                if size > MAX_SITEMAP_BYTES:
+                    break
+                parser.feed(chunk)
+
+                for event, element in parser.read_events():
+                    name = _local_name(element.tag)
+                    if event == "start":
+                        if root is None:
+                            root = element
+                        elif depth == 1 and name in ("url", "sitemap"):
+                            fields = {}
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth == 2 and name in ("loc", "lastmod", "priority", "changefreq"):
+                        fields[name] = (element.text or "").strip()
+                    elif depth == 1 and name in ("url", "sitemap"):
+                        loc = normalize_url(fields.get("loc", ""), sitemap_url)
+                        if loc and name == "sitemap":
+                            children.append(loc)
+                        elif loc and loc not in seen_urls and accept_url(loc):
+                            seen_urls.add(loc)
+                            try:
+                                priority = float(fields["priority"]) if fields.get("priority") else None
+                            except ValueError:
+                                priority = None
+                            entries.append(SitemapEntry(
+                                url=loc,
+                                lastmod=fields.get("lastmod") or None,
+                                priority=priority,
+                                changefreq=fields.get("changefreq") or None,
+                            ))
+                        # Drop finished elements so the tree stays small
+                        root.clear()
+                        if len(entries) >= max_urls:
+                            return entries, children
+    except Exception:
+        pass
+    return entries, children
+
+
+async def discover_sitemap_entries(
+    client: httpx.AsyncClient,
+    start_url: str,
+    explicit_sitemap_url: Optional[str],
+    timeout: float,
+    same_domain_only: bool,
+    max_urls: int,
+    cache_mode: CacheMode = "use",
+    robots_txt: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> List[SitemapEntry]:
+    """Discover page URLs (with lastmod/priority) from robots.txt and sitemaps.
+
+    Sitemap indexes are expanded concurrently (SITEMAP_FETCH_CONCURRENCY at a
+    time). Results keep the document order of the sitemaps (explicit URL,
+    robots.txt entries, /sitemap.xml, then each index's children in order),
+    deduplicated, truncated to `max_urls`.
+    """
+    parsed = urlparse(start_url)
+    base_root = f"{parsed.scheme}://{parsed.netloc}"
+
+    candidates: List[str] = []
+    if explicit_sitemap_url:
+        candidates.append(explicit_sitemap_url)
+    # robots.txt discovery (reuse the crawl's copy when given)
+    robots = robots_txt
+    if robots is None:
+        robots = await fetch_text(client, base_root + "/robots.txt", timeout, cache_mode, headers)
+    if robots:
+        sitemaps, _ = parse_robots_txt(robots, DEFAULT_HEADERS["User-Agent"])
+        for sm in sitemaps:
+            sm_norm = normalize_url(sm, base_root)
+            if sm_norm:
+                candidates.append(sm_norm)
+    # default location
+    candidates.append(base_root + "/sitemap.xml")
+
+    def accept_url(page_url: str) -> bool:
+        return not same_domain_only or same_registered_domain(start_url, page_url)
+
+    semaphore = asyncio.Semaphore(SITEMAP_FETCH_CONCURRENCY)
+    seen: Set[str] = set()
+    # (position of the sitemap in document order, its entries)
+    collected: List[Tuple[Tuple[int, ...], List[SitemapEntry]]] = []
+    # Distinct accepted page URLs so far: sitemaps often list the same pages
+    found: Set[str] = set()
+    tasks: Set[asyncio.Task] = set()
+
+    def schedule(sitemap_url: str, position: Tuple[int, ...]) -> None:
+        if sitemap_url in seen or len(found) >= max_urls:
+            return
+        seen.add(sitemap_url)
+        tasks.add(asyncio.ensure_future(load(sitemap_url, position)))
+
+    async def load(sitemap_url: str, position: Tuple[int, ...]) -> None:
+        async with semaphore:
+            if len(found) >= max_urls:
+                return
+            entries, children = await read_sitemap(
+                client, sitemap_url, timeout, cache_mode, accept_url, max_urls, headers
+            )
+        found.update(entry.url for entry in entries)
+        collected.append((position, entries))
+        for i, child in enumerate(children):
+            schedule(child, position + (i,))
+
+    for i, cand in enumerate(candidates):
+        schedule(cand, (i,))
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            tasks.difference_update(done)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    discovered: List[SitemapEntry] = []
+    discovered_urls: Set[str] = set()
+    for _, entries in sorted(collected, key=lambda item: item[0]):
+        for entry in entries:
+            if entry.url not in discovered_urls:
+                discovered_urls.add(entry.url)
+                discovered.append(entry)
+                if len(discovered) >= max_urls:
+                    return discovered
+    return discovered
+
+
+async def discover_sitemap_urls(
+    client: httpx.AsyncClient,
+    start_url: str,
+    explicit_sitemap_url: Optional[str],
+    timeout: float,
+    same_domain_only: bool,
+    max_urls: int,
+    cache_mode: CacheMode = "use",
+    robots_txt: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    entries = await discover_sitemap_entries(
+        client, start_url, explicit_sitemap_url, timeout, same_domain_only,
+        max_urls, cache_mode, robots_txt, headers,
+    )
+    return [entry.url for entry in entries]
+
+
+# ============================================================================
+# POLITENESS (PER-HOST RATE LIMITING) & FRONTIER
+# ============================================================================
+
+# Upper bound applied to robots.txt Crawl-delay (same as rate_limit_delay's)
+MAX_CRAWL_DELAY = 5.0
+
+
+def parse_robots_txt(text: str, user_agent: str) -> Tuple[List[str], Optional[float]]:
+    """Return (sitemap URLs, Crawl-delay) from a robots.txt.
+
+    The Crawl-delay of a group naming our user agent wins over the ``*`` group.
+    """
+    sitemaps: List[str] = []
+    delays: Dict[str, float] = {}
+    agents: List[str] = []
+    in_rules = False
+    for raw_line in text.splitlines():
+        line = raw_line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        name, value = line.split(':', 1)
+        name = name.strip().lower()
+        value = value.strip()
+        if name == 'sitemap':
+            sitemaps.append(value)
+        elif name == 'user-agent':
+            # A user-agent line after rules starts a new group
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+        else:
+            in_rules = True
+            if name == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for agent in agents:
+                    delays[agent] = delay
+
+    ua = user_agent.lower()
+    for agent, delay in delays.items():
+        if agent != '*' and agent in ua:
+            return sitemaps, delay
+    return sitemaps, delays.get('*')
+
+
+def host_key(url: str) -> str:
+    return (urlparse(url).hostname or '').lower()
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `capacity` banked; rate 0 = unlimited."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 when one is ready)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= 1
+
+
+class PolitenessScheduler:
+    """Per-host token buckets spacing requests by `delay` seconds.
+
+    Each host gets its own bucket, so hosts proceed independently. The delay
+    is the crawl's `rate_limit_delay`, raised to the host's robots.txt
+    Crawl-delay (capped at MAX_CRAWL_DELAY) once robots.txt has been read.
+    Nothing here sleeps: the frontier only hands out URLs whose host has a
+    token, and idle workers wait for the next one to become ready.
+
+    With `respect_crawl_delay`, prepare() reads a host's robots.txt as soon as
+    its first URL is queued, and the host gets no token until then: even its
+    first requests are spaced by the Crawl-delay. `on_host_ready` is awaited
+    once that host is ready, to wake idle workers.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, delay: float, timeout: float,
+                 cache_mode: CacheMode, user_agent: str, respect_crawl_delay: bool = True,
+                 on_host_ready: Optional[Callable[[], Awaitable[None]]] = None):
+        self.client = client
+        self.delay = delay
+        self.timeout = timeout
+        self.cache_mode = cache_mode
+        self.user_agent = user_agent
+        self.headers = {"User-Agent": user_agent}
+        self.respect_crawl_delay = respect_crawl_delay
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._robots: Dict[str, asyncio.Task] = {}
+        self.on_host_ready = on_host_ready
+        # Hosts whose Crawl-delay is being read (no token handed out meanwhile)
+        self._pending_hosts: Set[str] = set()
+        self._prepared_hosts: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(1.0 / self.delay if self.delay > 0 else 0.0)
+            self._buckets[host] = bucket
+        return bucket
+
+    def ready_in(self, host: str) -> float:
+        """Seconds until `host` may be requested (inf while its robots.txt is read)."""
+        if host in self._pending_hosts:
+            return math.inf
+        return self._bucket(host).wait_time()
+
+    def prepare(self, url: str) -> None:
+        """Start reading the Crawl-delay of the URL's host, once per host."""
+        host = host_key(url)
+        if not self.respect_crawl_delay or host in self._prepared_hosts:
+            return
+        self._prepared_hosts.add(host)
+        self._pending_hosts.add(host)
+        task = asyncio.ensure_future(self._prepare_host(url, host))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prepare_host(self, url: str, host: str) -> None:
+        try:
+            await self.apply_crawl_delay(url)
+        finally:
+            self._pending_hosts.discard(host)
+        if self.on_host_ready is not None:
+            await self.on_host_ready()
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def consume(self, host: str) -> None:
+        self._bucket(host).consume()
+
+    async def robots_txt(self, url: str) -> Optional[str]:
+        """robots.txt of the URL's origin, fetched once per crawl."""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        task = self._robots.get(origin)
+        if task is None:
+            task = asyncio.ensure_future(
+                fetch_text(self.client, origin + "/robots.txt", self.timeout, self.cache_mode, self.headers)
+            )
+            self._robots[origin] = task
+        return await asyncio.shield(task)
+
+    async def apply_crawl_delay(self, url: str) -> None:
+        """Slow the URL's host down to its robots.txt Crawl-delay, if larger."""
+        if not self.respect_crawl_delay:
+            return
+        robots = await self.robots_txt(url)
+        if not robots:
+            return
+        _, crawl_delay = parse_robots_txt(robots, self.user_agent)
+        if crawl_delay:
+            delay = min(max(crawl_delay, self.delay), MAX_CRAWL_DELAY)
+            bucket = self._bucket(host_key(url))
+            if delay > 0 and (bucket.rate <= 0 or 1.0 / delay < bucket.rate):
+                bucket.rate = 1.0 / delay
+
+
+# Value of a page for the voice agent, by type (page_type_from_url types,
+# plus 'article' for blog/news/pagination URLs). Overridable per request.
+PRIORITY_WEIGHTS = {
+    'home': 10.0, 'contact': 9.0, 'store': 8.0, 'about': 7.0, 'service': 7.0, 'faq': 6.0,
+    'category': 3.0, 'page': 2.0, 'product': 1.0, 'article': 0.0,
+}
+# Score lost per link hop from the start page, and gained per unit of sitemap <priority>
+PRIORITY_DEPTH_PENALTY = 1.0
+PRIORITY_SITEMAP_BONUS = 2.0
+
+# Anchor text or URL words revealing a page type the URL fragments miss (DE/FR/IT/EN)
+PAGE_TYPE_TEXT_SIGNALS = [
+    ('contact', re.compile(r'\b(kontakt|contatt|nous joindre|impressum|anfahrt|plan d.acc[eè]s)', re.IGNORECASE)),
+    ('store', re.compile(r'\b(horaires?|heures d.ouverture|(ö|oe)ffnungszeiten|opening hours|orari|filiale|standort|succursale|boutique|shop)', re.IGNORECASE)),
+    ('about', re.compile(r'\b(about|(ü|ue)ber uns|qui sommes|notre (entreprise|histoire|équipe)|unternehmen|team|chi siamo)', re.IGNORECASE)),
+    ('service', re.compile(r'\b(services?|prestations?|dienstleistung|leistungen|angebot|tarifs?|prix|preise)', re.IGNORECASE)),
+    ('faq', re.compile(r'\b(faq|fragen|aide|hilfe|help)\b', re.IGNORECASE)),
+]
+LOW_VALUE_URL_RE = re.compile(
+    r'/(blog|news|actualites?|aktuell|magazine?|presse|press|tag|tags|author|auteur|archives?)(/|$)'
+    r'|/(19|20)\d\d/\d\d?/|[?&](page|p|offset)=\d+|/page/\d+',
+    re.IGNORECASE,
+)
+
+
+def url_priority(url: str, anchor: str, depth: int, weights: Dict[str, float],
+                 sitemap_priority: Optional[float] = None) -> float:
+    """Frontier score of a URL: higher is fetched first."""
+    page_type = page_type_from_url(url)
+    if page_type == 'page':
+        if LOW_VALUE_URL_RE.search(url):
+            page_type = 'article'
+        else:
+            words = f"{anchor} {urlsplit(url).path.replace('-', ' ').replace('/', ' ')}"
+            for signal_type, pattern in PAGE_TYPE_TEXT_SIGNALS:
+                if pattern.search(words):
+                    page_type = signal_type
+                    break
+    score = weights.get(page_type, weights.get('page', 0.0)) - PRIORITY_DEPTH_PENALTY * depth
+    if sitemap_priority is not None:
+        score += PRIORITY_SITEMAP_BONUS * sitemap_priority
+    return score
+
+
+class HostFrontier:
+    """Crawl frontier with one priority queue per host, hosts served round-robin.
+
+    Within a host, URLs come out by descending score, then in push order
+    (all scores equal gives plain FIFO). `pop_ready` only returns URLs whose
+    host currently has a politeness token, so a busy host never blocks work
+    queued for other hosts.
+    """
+
+    def __init__(self):
+        # host -> heap of (-score, push order, url, depth)
+        self._queues: "OrderedDict[str, List[Tuple[float, int, str, int]]]" = OrderedDict()
+        self._size = 0
+        self._pushed = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, url: str, depth: int, score: float = 0.0) -> None:
+        host = host_key(url)
+        if host not in self._queues:
+            self._queues[host] = []
+        heapq.heappush(self._queues[host], (-score, self._pushed, url, depth))
+        self._pushed += 1
+        self._size += 1
+
+    def pop_ready(self, scheduler: PolitenessScheduler) -> Optional[Tuple[str, int]]:
+        for host, queue in self._queues.items():
+            if scheduler.ready_in(host) > 0:
+                continue
+            _, _, url, depth = heapq.heappop(queue)
+            item = (url, depth)
+            if queue:
+                self._queues.move_to_end(host)
+            else:
+                del self._queues[host]
+            self._size -= 1
+            scheduler.consume(host)
+            return item
+        return None
+
+    def next_ready_in(self, scheduler: PolitenessScheduler) -> Optional[float]:
+        """Seconds until some queued host is ready; None if all wait for robots.txt."""
+        delay = min((scheduler.ready_in(host) for host in self._queues), default=0.0)
+        return None if delay == math.inf else delay
+
+
+# Called as each dispatched page finishes: (dispatch order, page or None if it failed)
+PageCallback = Callable[[int, Optional[PageContent]], Awaitable[None]]
+
+
+@dataclass
+class CrawlProgress:
+    """Live counters of a running crawl (read by the job API)."""
+    pages_done: int = 0
+    pages_failed: int = 0
+    in_flight: int = 0
+    queued: int = 0
+
+
+async def crawl(request: CrawlRequest, on_page: Optional[PageCallback] = None,
+                progress: Optional[CrawlProgress] = None,
+                client: Optional[httpx.AsyncClient] = None,
+                fetch_limiter: Optional["FairLimiter"] = None) -> List[PageContent]:
+    """Crawl from `request.url` and return pages in dispatch order.
+
+    When `on_page` is given, pages are handed to it as they finish instead of
+    being collected (the returned list is then empty), which keeps memory
+    bounded for streaming. `progress`, if given, is kept up to date.
+    `client` replaces the shared HTTP client (HTTP_CLIENT), and every fetch
+    and render waits for a slot of `fetch_limiter` if given.
+    """
+
+    exclude_patterns: List[re.Pattern] = []
+    if request.exclude_patterns:
+        exclude_patterns = [re.compile(p, re.IGNORECASE) for p in request.exclude_patterns]
+
+    start_url = str(request.url)
+    rules = request.canonicalization
+    # Canonical keys of URLs ever put on the frontier or fetched (never scheduled twice)
+    visited: Set[str] = set()
+    # Sitemap URLs queued at depth 0, with their sitemap <priority>
+    seeds: Dict[str, Optional[float]] = {}
+    # (dispatch order, page): results are returned in BFS dispatch order
+    results: List[Tuple[int, PageContent]] = []
+    pages_done = 0
+    user_agent = request.user_agent or DEFAULT_HEADERS["User-Agent"]
+    # Sent with each request: the client is shared with other crawls
+    headers = {"User-Agent": user_agent}
+
+    frontier = HostFrontier()
+    weights = {**PRIORITY_WEIGHTS, **(request.priority_weights or {})}
+    render_modes = HostRenderModes()
+    scheduler: Optional[PolitenessScheduler] = None
+    # Notified whenever a page finishes (new links queued or a slot freed)
+    state_changed = asyncio.Condition()
+    in_flight = 0
+    dispatched = 0
+    pages_failed = 0
+
+    def report_progress() -> None:
+        if progress is not None:
+            progress.pages_done = pages_done
+            progress.pages_failed = pages_failed
+            progress.in_flight = in_flight
+            progress.queued = len(frontier)
+
+    def fetch_slot():
+        return fetch_limiter.slot(start_url) if fetch_limiter is not None else contextlib.nullcontext()
+
+    def is_allowed(url: str) -> bool:
+        if request.same_domain and not same_registered_domain(start_url, url):
+            return False
+        if request.skip_binary_extensions and has_binary_extension(url):
+            return False
+        return not any(p.search(url) for p in exclude_patterns)
+
+    def enqueue(url: str, depth: int, anchor: str = "", sitemap_priority: Optional[float] = None,
+                score: Optional[float] = None) -> None:
+        url = canonicalize_url(url, rules)
+        key = canonical_key(url, rules)
+        if key not in visited:
+            visited.add(key)
+            if is_allowed(url):
+                if score is None:
+                    score = url_priority(url, anchor, depth, weights, sitemap_priority) if request.prioritize else 0.0
+                scheduler.prepare(url)
+                frontier.push(url, depth, score)
+
+    async def process_page(client: httpx.AsyncClient, url: str, depth: int) -> Optional[PageContent]:
+        """Fetch and extract a single page, queueing its links for the next depth."""
+        with_links = depth < request.depth
+
+        async def render() -> Optional[str]:
+            async with fetch_slot():
+                return await fetch_html_with_js(
+                    url, request.timeout, user_agent, request.render_blocking,
+                    request.render_budget, request.render_scroll,
+                )
+
+        # Host already known to be an SPA: render directly, no static fetch or detection
+        mode = render_modes.decide(url) if request.use_js_rendering and PLAYWRIGHT_AVAILABLE else None
+        source = "detected" if mode is None else "memo"
+        page_data = None
+        if mode == "js":
+            html_js = await render()
+            if html_js:
+                page_data = await run_analyze_page(html_js, url, request.max_chars_per_page, with_links, False)
+            else:
+                mode = "static"  # render failed: fall back to the static page
+
+        if page_data is None:
+            # Try static HTML first (fast)
+            async with fetch_slot():
+                html = await fetch_html(client, url, request.timeout, request.cache_mode,
+                                        request.max_bytes_per_page, headers)
+            if not html:
+                return None
+
+            # Parse once and extract in the executor; the loop only does I/O.
+            # Pages of a host known to be static skip the SPA detection.
+            detect_js = request.use_js_rendering and source == "detected"
+            page_data = await run_analyze_page(html, url, request.max_chars_per_page, with_links, detect_js)
+
+            if source == "detected":
+                mode = "js" if page_data['js_rendered'] else "static"
+                if request.use_js_rendering:
+                    render_modes.record(url, mode)
+
+            # Empty SPA shell: retry with Playwright for JS-rendered content
+            if page_data['js_rendered']:
+                JS_FALLBACKS.inc(host_class(url))
+                html_js = await render()
+                page_data = await run_analyze_page(
+                    html_js or html, url, request.max_chars_per_page, with_links, False
+                )
+        RENDER_MODE_DECISIONS.inc(mode, source)
+        links = page_data['links']
+
+        # The page's declared canonical URL is the same document: never fetch it again
+        canonical = page_data.get('canonical_url')
+        if canonical and rules.enabled and rules.use_link_canonical:
+            canonical = normalize_url(canonical, url)
+            if canonical:
+                visited.add(canonical_key(canonical, rules))
+
+        # Create PageContent with all metadata
+        page_content = PageContent(
+            url=url,
+            title=page_data['title'],
+            description=page_data['description'],
+            markdown=page_data['markdown'],
+            crawled_at=datetime.utcnow().isoformat() + 'Z',
+            page_type=page_data['page_type'],
+            lang=page_data['lang'],
+            canonical_url=page_data.get('canonical_url'),
+            contact_info=page_data.get('contact_info', {}),
+            structured_data=page_data.get('structured_data', {}),
+            content_hash=page_data.get('content_hash', ''),
+            simhash=page_data.get('simhash'),
+            render_mode=mode,
+            render_mode_source=source,
+        )
+        
+        # Add links to the frontier for the next depth level
+        for link, anchor in links:
+            enqueue(link, depth + 1, anchor)
+        
+        return page_content
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        """Long-lived worker: keeps pulling from the frontier until the crawl is done.
+
+        A URL is only taken while `results + in_flight < max_pages`, so the page
+        budget is never overshot; a failed page hands its slot back. Only URLs
+        whose host has a politeness token are taken: a worker with nothing
+        ready waits idle (holding no slot) until the next host is due. The
+        crawl ends when the budget is met, or the frontier is empty and no
+        page is in flight (nothing left that could queue new links).
+        """
+        nonlocal in_flight, dispatched, pages_done, pages_failed
+        while True:
+            async with state_changed:
+                while True:
+                    if pages_done >= request.max_pages:
+                        return
+                    if frontier and pages_done + in_flight < request.max_pages:
+                        item = frontier.pop_ready(scheduler)
+                        if item is not None:
+                            break
+                        # Every queued host is cooling down (or waiting for its
+                        # robots.txt): wake up when the next one is due, or
+                        # earlier if a page finishes or a host becomes ready
+                        try:
+                            await asyncio.wait_for(state_changed.wait(), frontier.next_ready_in(scheduler))
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    if not frontier and in_flight == 0:
+                        return
+                    await state_changed.wait()
+                url, depth = item
+                in_flight += 1
+                order = dispatched
+                dispatched += 1
+                report_progress()
+
+            page: Optional[PageContent] = None
+            outcome = "failed"
+            try:
+                page = await process_page(client, url, depth)
+                if page is not None:
+                    outcome = "ok"
+            except Exception as e:
+                # Log but continue
+                outcome = "error"
+                print(f"Error processing page {url}: {e}")
+            finally:
+                PAGES_TOTAL.inc(host_class(url), outcome)
+                async with state_changed:
+                    in_flight -= 1
+                    if page is not None and pages_done < request.max_pages:
+                        pages_done += 1
+                        if on_page is None:
+                            results.append((order, page))
+                    else:
+                        page = None
+                        pages_failed += 1
+                    report_progress()
+                    state_changed.notify_all()
+
+            if on_page is not None:
+                await on_page(order, page)
+
+    async def wake_workers() -> None:
+        async with state_changed:
+            state_changed.notify_all()
+
+    ACTIVE_CRAWLS.inc()
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            if client is None:
+                client = await stack.enter_async_context(HTTP_CLIENT.session(request.max_concurrent * 2))
+            scheduler = PolitenessScheduler(
+                client=client,
+                delay=request.rate_limit_delay,
+                timeout=request.timeout,
+                cache_mode=request.cache_mode,
+                user_agent=user_agent,
+                respect_crawl_delay=request.respect_crawl_delay,
+                on_host_ready=wake_workers,
+            )
+            stack.callback(scheduler.close)
+
+            # Optional sitemap discovery to broaden initial queue
+            if request.use_sitemap:
+                try:
+                    sitemap_entries = await discover_sitemap_entries(
+                        client=client,
+                        start_url=start_url,
+                        explicit_sitemap_url=request.sitemap_url,
+                        timeout=request.timeout,
+                        same_domain_only=request.same_domain,
+                        max_urls=min(request.max_pages * 5, request.sitemap_max_urls),
+                        cache_mode=request.cache_mode,
+                        robots_txt=await scheduler.robots_txt(start_url),
+                        headers=headers,
+                    )
+                    for entry in sitemap_entries:
+                        seeds.setdefault(entry.url, entry.priority)
+                except Exception:
+                    pass
+
+            # The start page is always fetched first
+            enqueue(start_url, 0, score=float('inf'))
+            for u, sitemap_priority in seeds.items():
+                enqueue(u, 0, sitemap_priority=sitemap_priority)
+            report_progress()
+
+            await asyncio.gather(*(worker(client) for _ in range(request.max_concurrent)))
+    finally:
+        ACTIVE_CRAWLS.dec()
+
+    results.sort(key=lambda item: item[0])
+    return [page for _, page in results]
+
+
+def format_page_section(page: PageContent, index: int) -> str:
+    """Render one page as a voice-AI section; `index` is its 1-based position in the output."""
+    sec: List[str] = []
+    page_title = page.title or f"Page {index}"
     
-    # Build simple page sections
-    sections: List[str] = []
+    # Simple separator
+    if index > 1:
+        sec.append("")
+        sec.append("---")
+        sec.append("")
+    
+    # Page title as main heading
+    sec.append(f"# {page_title}")
+    sec.append("")
+    
+    # Simple URL
+    sec.append(f"URL: {page.url}")
+    sec.append("")
     
-    for i, page in enumerate(unique_pages, start=1):
-        sec: List[str] = []
-        page_title = page.title or f"Page {i}"
+    # Description if available
+    if page.description:
+        sec.append(page.description)
+        sec.append("")
+    
+    # Contact Information - SIMPLE FORMAT for voice AI
+    if page.contact_info:
+        contact = page.contact_info
         
-        # Simple separator
-        if i > 1:
-            sec.append("")
-            sec.append("---")
+        if contact.get('emails'):
+            for email in contact['emails']:
+                sec.append(f"Email: {email}")
             sec.append("")
         
-        # Page title as main heading
-        sec.append(f"# {page_title}")
-        sec.append("")
-        
-        # Simple URL
-        sec.append(f"URL: {page.url}")
-        sec.append("")
+        if contact.get('phones'):
+            for phone in contact['phones']:
+                # Use display format, not e164
+                display = phone.get('display', phone.get('e164', ''))
+                sec.append(f"Téléphone: {display}")
+            sec.append("")
         
-        # Description if available
-        if page.description:
-            sec.append(page.description)
+        if contact.get('addresses'):
+            for addr in contact['addresses']:
+                sec.append(f"Adresse: {addr}")
             sec.append("")
+    
+    # Opening Hours - simple text format
+    if page.structured_data.get('opening_hours'):
+        hours = page.structured_data['opening_hours']
         
-        # Contact Information - SIMPLE FORMAT for voice AI
-        if page.contact_info:
-            contact = page.contact_info
-            
-            if contact.get('emails'):
-                for email in contact['emails']:
-                    sec.append(f"Email: {email}")
-                sec.append("")
-            
-            if contact.get('phones'):
-                for phone in contact['phones']:
-                    # Use display format, not e164
-                    display = phone.get('display', phone.get('e164', ''))
-                    sec.append(f"Téléphone: {display}")
-                sec.append("")
+        if hours.get('status') == 'winter_closure':
+            sec.append(f"Horaires: {hours.get('note', 'Fermé')}")
+            sec.append("")
+        else:
+            sec.append("Horaires:")
+            day_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+            day_names_fr = {
+                'monday': 'Lundi', 'tuesday': 'Mardi', 'wednesday': 'Mercredi',
+                'thursday': 'Jeudi', 'friday': 'Vendredi', 'saturday': 'Samedi',
+                'sunday': 'Dimanche'
+            }
             
-            if contact.get('addresses'):
-                for addr in contact['addresses']:
-                    sec.append(f"Adresse: {addr}")
-                sec.append("")
-        
-        # Opening Hours - simple text format
-        if page.structured_data.get('opening_hours'):
-            hours = page.structured_data['opening_hours']
+            for day in day_order:
+                if day in hours:
+                    day_data = hours[day]
+                    day_name = day_names_fr.get(day, day.capitalize())
+                    
+                    if day_data.get('status') == 'closed':
+                        sec.append(f"- {day_name}: Fermé")
+                    elif day_data.get('status') == 'open' and day_data.get('slots'):
+                        slots_str = ', '.join([f"{s['open']}-{s['close']}" for s in day_data['slots']])
+                        sec.append(f"- {day_name}: {slots_str}")
             
-            if hours.get('status') == 'winter_closure':
-                sec.append(f"Horaires: {hours.get('note', 'Fermé')}")
-                sec.append("")
-            else:
-                sec.append("Horaires:")
-                day_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-                day_names_fr = {
-                    'monday': 'Lundi', 'tuesday': 'Mardi', 'wednesday': 'Mercredi',
-                    'thursday': 'Jeudi', 'friday': 'Vendredi', 'saturday': 'Samedi',
-                    'sunday': 'Dimanche'
-                }
-                
-                for day in day_order:
-                    if day in hours:
-                        day_data = hours[day]
-                        day_name = day_names_fr.get(day, day.capitalize())
-                        
-                        if day_data.get('status') == 'closed':
-                            sec.append(f"- {day_name}: Fermé")
-                        elif day_data.get('status') == 'open' and day_data.get('slots'):
-                            slots_str = ', '.join([f"{s['open']}-{s['close']}" for s in day_data['slots']])
-                            sec.append(f"- {day_name}: {slots_str}")
-                
-        sec.append("")
-        
-        # Main content
-        sec.append(page.markdown)
-        sec.append("")
-        
-        sections.append("\n".join(sec))
+    sec.append("")
+    
+    # Main content
+    sec.append(page.markdown)
+    sec.append("")
+    
+    return "\n".join(sec)
+
+
+NO_CONTENT_MARKDOWN = "_No content extracted._"
+
+
+def aggregate_markdown(start_url: str, req: CrawlRequest, pages: List[PageContent], user_agent: str) -> str:
+    """Generate clean, simple output optimized for voice AI reading."""
+    
+    # Strip site-wide boilerplate blocks (header, footer, menus...)
+    pages = BoilerplateFilter(req.boilerplate_threshold).strip_all(pages)
+
+    # Deduplicate pages by content hash, then collapse near-duplicates
+    dedup = PageDeduplicator(req.near_duplicate_threshold)
+    unique_pages = [page for page in pages if dedup.accept(page)]
+    
+    # Build simple page sections
+    sections = [format_page_section(page, i) for i, page in enumerate(unique_pages, start=1)]
 
     if not sections:
-        sections.append("_No content extracted._")
+        sections.append(NO_CONTENT_MARKDOWN)
 
     return "\n".join(sections)
 
 
+# ============================================================================
+# CRAWL RESULT CACHE
+# ============================================================================
+
+# Request fields that do not change the crawl output and are left out of the key
+RESULT_CACHE_IGNORED_FIELDS = {'use_result_cache', 'cache_mode', 'max_concurrent', 'rate_limit_delay', 'stream'}
+
+
+def result_cache_key(req: CrawlRequest) -> str:
+    """Key identifying crawls that produce the same output."""
+    fields = req.model_dump(mode="json", exclude=RESULT_CACHE_IGNORED_FIELDS)
+    fields['url'] = cache_key(fields['url'])
+    if fields.get('exclude_patterns'):
+        fields['exclude_patterns'] = sorted(set(fields['exclude_patterns']))
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """In-process cache of crawl outputs with TTL, LRU size bound and single-flight.
+
+    Concurrent callers asking for the same key share one computation: the
+    first starts it, the others await the same task. Only successful results
+    are stored.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (expires_at, host, value, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[float, str, str, int]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def _remove(self, key: str) -> None:
+        self._total_bytes -= self._entries.pop(key)[3]
+
+    def _store(self, key: str, host: str, value: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, host, value, size)
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def peek(self, key: str) -> Optional[str]:
+        """Return a fresh cached value without computing anything."""
+        value = self._get(key)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    async def get_or_compute(self, key: str, host: str, compute: Callable[[], Awaitable[str]],
+                             shared: bool = True) -> str:
+        """Cached value for `key`, or compute and store it.
+
+        With `shared`, concurrent callers of the same key wait for a single
+        computation that outlives any one of them. Otherwise the computation
+        runs in the caller's task (cancelled with it) and is only stored.
+        """
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        if not shared:
+            self.misses += 1
+            value = await compute()
+            self._store(key, host, value)
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+
+            def on_done(t: asyncio.Task) -> None:
+                self._in_flight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self._store(key, host, t.result())
+
+            task.add_done_callback(on_done)
+        # shield: one caller going away must not cancel the crawl for the others
+        return await asyncio.shield(task)
+
+    def invalidate_host(self, host: str) -> int:
+        """Drop every cached result for a site; returns the number removed."""
+        keys = [k for k, entry in self._entries.items() if entry[1] == host]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'in_flight': len(self._in_flight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+        }
+
+
+RESULT_CACHE = ResultCache(
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "600")),
+    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "100")) * 1024 * 1024),
+)
+
+
+async def crawl_markdown(req: CrawlRequest, **crawl_options) -> str:
+    """Crawl and aggregate, reusing a recent identical crawl when allowed.
+
+    The result cache is skipped when `use_result_cache` is off or the HTTP
+    cache mode asks for fresh data (refresh / bypass). `crawl_options` are
+    passed to crawl(); such a crawl depends on the caller's resources (client,
+    limiter), so it is not shared with concurrent identical requests.
+    """
+    user_agent = req.user_agent or DEFAULT_HEADERS["User-Agent"]
+
+    async def run() -> str:
+        pages = await crawl(req, **crawl_options)
+        return aggregate_markdown(str(req.url), req, pages, user_agent)
+
+    if not req.use_result_cache or req.cache_mode != "use" or RESULT_CACHE.max_bytes <= 0:
+        return await run()
+    host = (urlparse(str(req.url)).hostname or "").lower()
+    return await RESULT_CACHE.get_or_compute(result_cache_key(req), host, run, shared=not crawl_options)
+
+
+async def stream_markdown(req: CrawlRequest) -> AsyncIterator[str]:
+    """Yield the `aggregate_markdown` output section by section while crawling.
+
+    The start URL's section always comes first: pages finishing before it are
+    held back until it is done (or has failed). The page hand-off queue is
+    bounded, so a slow client applies back-pressure to the crawl instead of
+    buffering the whole output.
+    """
+    cached = RESULT_CACHE.peek(result_cache_key(req)) if req.use_result_cache and req.cache_mode == "use" else None
+    if cached is not None:
+        yield cached
+        return
+
+    finished: "asyncio.Queue[Optional[Tuple[int, Optional[PageContent]]]]" = asyncio.Queue(
+        maxsize=req.max_concurrent
+    )
+
+    async def on_page(order: int, page: Optional[PageContent]) -> None:
+        await finished.put((order, page))
+
+    async def run() -> None:
+        try:
+            await crawl(req, on_page=on_page)
+        except Exception as e:
+            print(f"Crawl error (stream): {e}")
+        # Not in a finally: a cancelled crawl means the client is gone and
+        # nobody reads the (possibly full) queue any more
+        await finished.put(None)
+
+    task = asyncio.ensure_future(run())
+    boilerplate = BoilerplateFilter(req.boilerplate_threshold)
+    dedup = PageDeduplicator(req.near_duplicate_threshold)
+    emitted = 0
+    held: List[Tuple[int, PageContent]] = []
+    start_done = False
+
+    def render(page: PageContent) -> Optional[str]:
+        nonlocal emitted
+        page = boilerplate.strip_online(page)
+        if not dedup.accept(page):
+            return None
+        emitted += 1
+        section = format_page_section(page, emitted)
+        return section if emitted == 1 else "\n" + section
+
+    try:
+        while True:
+            item = await finished.get()
+            if item is None:
+                break
+            order, page = item
+            if not start_done:
+                if page is not None:
+                    held.append((order, page))
+                if order != 0:
+                    continue
+                # Start page resolved: flush it first, then whatever was held
+                start_done = True
+                held.sort(key=lambda entry: entry[0])
+                pending, held = [p for _, p in held], []
+            else:
+                pending = [page] if page is not None else []
+            for p in pending:
+                chunk = render(p)
+                if chunk is not None:
+                    yield chunk
+
+        for _, p in sorted(held, key=lambda entry: entry[0]):
+            chunk = render(p)
+            if chunk is not None:
+                yield chunk
+        if emitted == 0:
+            yield NO_CONTENT_MARKDOWN
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# ============================================================================
+# ASYNC CRAWL JOBS
+# ============================================================================
+
+class JobRequest(CrawlRequest):
+    callback_url: Optional[HttpUrl] = None  # POSTed a JSON notification when the job ends
+
+
+@dataclass
+class CrawlJob:
+    id: str
+    request: JobRequest
+    status: str = "queued"  # queued, running, done, failed
+    created_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    expires_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[str] = None
+    progress: CrawlProgress = field(default_factory=CrawlProgress)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'url': str(self.request.url),
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'pages_done': self.progress.pages_done,
+            'pages_failed': self.progress.pages_failed,
+            'pages_in_flight': self.progress.in_flight,
+            'queued': self.progress.queued,
+            'error': self.error,
+        }
+
+
+def utc_now_iso() -> str:
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+class JobManager:
+    """Background crawl jobs built on crawl() and aggregate_markdown().
+
+    At most `max_running` jobs crawl at once; further jobs wait in order, up
+    to `max_pending` (beyond that, submit() refuses). Finished jobs and their
+    markdown are kept for `result_ttl` seconds.
+    """
+
+    def __init__(self, max_running: int, max_pending: int, result_ttl: float):
+        self.max_running = max_running
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._semaphore = asyncio.Semaphore(max_running)
+        self._jobs: Dict[str, CrawlJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for job_id in [j.id for j in self._jobs.values() if j.expires_at is not None and j.expires_at < now]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[CrawlJob]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def submit(self, request: JobRequest) -> Optional[CrawlJob]:
+        """Queue a job; returns None when too many jobs are already waiting."""
+        self._purge_expired()
+        pending = sum(1 for j in self._jobs.values() if j.status == "queued")
+        if pending >= self.max_pending:
+            return None
+        job = CrawlJob(id=uuid.uuid4().hex, request=request, created_at=utc_now_iso())
+        self._jobs[job.id] = job
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: CrawlJob) -> None:
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = utc_now_iso()
+            try:
+                pages = await crawl(job.request, progress=job.progress)
+                user_agent = job.request.user_agent or DEFAULT_HEADERS["User-Agent"]
+                job.result = aggregate_markdown(str(job.request.url), job.request, pages, user_agent)
+                job.status = "done"
+            except Exception as e:
+                print(f"Crawl job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = utc_now_iso()
+                job.expires_at = time.monotonic() + self.result_ttl
+        if job.request.callback_url:
+            await self._notify(job)
+
+    async def _notify(self, job: CrawlJob) -> None:
+        payload = job.summary()
+        payload['result_path'] = f"/jobs/{job.id}/result"
+        try:
+            async with HTTP_CLIENT.session() as client:
+                await client.post(str(job.request.callback_url), json=payload, timeout=job.request.timeout)
+        except Exception as e:
+            print(f"Callback for job {job.id} failed: {e}")
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        self._purge_expired()
+        statuses = Counter(job.status for job in self._jobs.values())
+        return {
+            'max_running': self.max_running,
+            'max_pending': self.max_pending,
+            'result_ttl_seconds': self.result_ttl,
+            **{status: statuses.get(status, 0) for status in ("queued", "running", "done", "failed")},
+        }
+
+
+JOB_MANAGER = JobManager(
+    max_running=int(os.getenv("JOBS_MAX_RUNNING", "2")),
+    max_pending=int(os.getenv("JOBS_MAX_PENDING", "100")),
+    result_ttl=float(os.getenv("JOBS_RESULT_TTL", "3600")),
+)
+
+
+# ============================================================================
+# BATCH CRAWLS
+# ============================================================================
+
+class FairLimiter:
+    """Concurrency limit shared by several crawls, handed out round-robin.
+
+    Waiters are queued per key (one key per site): when a slot frees up it
+    goes to the next site in turn, so a site with many queued fetches cannot
+    starve the others.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, key: str):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(key, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()  # granted just as we were cancelled: pass it on
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        # The slot is handed over directly, so `active` only drops when nobody waits
+        while self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+BATCH_MAX_SITES = int(os.getenv("BATCH_MAX_SITES", "500"))
+
+
+class BatchRequest(BaseModel):
+    crawls: List[CrawlRequest]
+    max_concurrent_sites: int = 4  # Sites crawled at the same time
+    max_concurrent_fetches: int = 20  # Fetches + renders in flight across the whole batch
+    stream: bool = False  # NDJSON: one line per site, as soon as it finishes
+
+
+async def run_batch(batch: BatchRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Crawl every site of `batch`, yielding each site's result as it finishes.
+
+    Sites share the HTTP client's connection pool and one fetch/render
+    budget, granted fairly between them.
+    """
+    limiter = FairLimiter(batch.max_concurrent_fetches)
+    site_slots = asyncio.Semaphore(batch.max_concurrent_sites)
+    finished: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    async with HTTP_CLIENT.session(batch.max_concurrent_fetches * 2) as client:
+        async def run_site(index: int, req: CrawlRequest) -> None:
+            result: Dict[str, Any] = {'index': index, 'url': str(req.url)}
+            async with site_slots:
+                started = time.perf_counter()
+                try:
+                    result['markdown'] = await crawl_markdown(
+                        req, client=client, fetch_limiter=limiter
+                    )
+                    result['status'] = "done"
+                except Exception as e:
+                    print(f"Batch crawl error for {req.url}: {e}")
+                    result['status'] = "failed"
+                    result['error'] = str(e)
+                result['duration_seconds'] = round(time.perf_counter() - started, 3)
+            await finished.put(result)
+
+        tasks = [asyncio.create_task(run_site(i, req)) for i, req in enumerate(batch.crawls)]
+        try:
+            for _ in tasks:
+                yield await finished.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_batch_ndjson(batch: BatchRequest) -> AsyncIterator[str]:
+    async for result in run_batch(batch):
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+@app.post("/crawl/batch")
+async def crawl_batch(payload: BatchRequest):
+    """Crawl many sites under one global fetch/render budget.
+
+    Returns ``{"results": [...]}`` in request order, or with ``stream`` an
+    NDJSON line per site in completion order.
+    """
+    if not payload.crawls or len(payload.crawls) > BATCH_MAX_SITES:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1 to {BATCH_MAX_SITES} crawls")
+    if any(req.depth < 0 or req.max_pages < 1 for req in payload.crawls):
+        raise HTTPException(status_code=400, detail="Invalid crawl parameters")
+    if payload.max_concurrent_sites < 1 or payload.max_concurrent_fetches < 1:
+        raise HTTPException(status_code=400, detail="Concurrency limits must be at least 1")
+    if payload.stream:
+        return StreamingResponse(stream_batch_ndjson(payload), media_type="application/x-ndjson")
+    results = [result async for result in run_batch(payload)]
+    results.sort(key=lambda result: result['index'])
+    return {'results': results}
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(payload: JobRequest):
+    """Start a crawl in the background and return its job id immediately."""
+    if payload.depth < 0 or payload.max_pages < 1:
+        raise HTTPException(status_code=400, detail="Invalid crawl parameters")
+    job = JOB_MANAGER.submit(payload)
+    if job is None:
+        raise HTTPException(status_code=429, detail="Too many pending jobs, retry later")
+    return job.summary()
+
+
+@app.get("/jobs")
+async def jobs_stats():
+    """Report job counts by status."""
+    return JOB_MANAGER.stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report a job's status and progress (pages done, queued, failed)."""
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.summary()
+
+
+@app.get("/jobs/{job_id}/result", response_class=PlainTextResponse)
+async def get_job_result(job_id: str):
+    """Return the markdown of a finished job."""
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return PlainTextResponse(content=job.result, media_type="text/markdown; charset=utf-8")
+
+
+@app.get("/metrics")
+async def metrics():
+    """Fetch/render/extraction metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/browser-pool")
+async def browser_pool_stats():
+    """Report usage of the shared Playwright browser pool."""
+    return BROWSER_POOL.stats()
+
+
+@app.get("/http-client")
+async def http_client_stats():
+    """Report the shared HTTP client's settings and DNS cache counters."""
+    return HTTP_CLIENT.stats()
+
+
+@app.get("/http-cache")
+async def http_cache_stats():
+    """Report size and hit counters of the on-disk HTTP response cache."""
+    return await HTTP_CACHE.stats()
+
+
+@app.get("/result-cache")
+async def result_cache_stats():
+    """Report entries and hit counters of the crawl result cache."""
+    return RESULT_CACHE.stats()
+
+
+@app.delete("/result-cache")
+async def result_cache_invalidate(url: HttpUrl = Query(..., description="Site dont les résultats sont invalidés")):
+    """Invalidate every cached crawl result for the site of `url`."""
+    host = (url.host or "").lower()
+    return {'host': host, 'invalidated': RESULT_CACHE.invalidate_host(host)}
+
+
 @app.get("/crawl", response_class=PlainTextResponse)
 async def crawl_get(
     url: HttpUrl = Query(..., description="URL à crawler"),
@@ -1241,7 +4184,22 @@ async def crawl_get(
     sitemap_url: Optional[str] = Query(None),
     sitemap_max_urls: int = Query(100, ge=1, le=5000),
     use_js_rendering: bool = Query(True, description="Enable JavaScript rendering for SPAs"),
+    respect_crawl_delay: bool = Query(True, description="Honour robots.txt Crawl-delay"),
     max_concurrent: int = Query(10, ge=1, le=50, description="Maximum concurrent requests for parallel crawling"),
+    cache_mode: CacheMode = Query("use", description="HTTP cache: use, refresh or bypass"),
+    use_result_cache: bool = Query(True, description="Reuse a recent identical crawl"),
+    stream: bool = Query(False, description="Stream page sections as they are crawled"),
+    near_duplicate_threshold: float = Query(0.9, ge=0.0, le=1.0, description="Collapse near-duplicate pages (0 = off)"),
+    boilerplate_threshold: float = Query(0.5, ge=0.0, le=1.0, description="Strip blocks repeated on more than this share of pages (0 = off)"),
+    canonicalize: bool = Query(True, description="Treat equivalent URLs (scheme, trailing slash, tracking params...) as one page"),
+    ignored_params: Optional[List[str]] = Query(None, description="Extra query parameters to ignore when comparing URLs"),
+    max_bytes_per_page: int = Query(5 * 1024 * 1024, ge=64 * 1024, le=50 * 1024 * 1024, description="Cut longer HTML bodies to this many bytes"),
+    skip_binary_extensions: bool = Query(True, description="Skip links to .pdf, .zip, .mp4... without requesting them"),
+    block_render_resources: bool = Query(True, description="Block images, media, fonts and trackers during JS rendering"),
+    block_css: bool = Query(False, description="Also block stylesheets during JS rendering"),
+    render_budget: float = Query(10.0, ge=0.5, le=60.0, description="Max seconds per JS render (capped by timeout)"),
+    render_scroll: bool = Query(True, description="Scroll rendered pages until lazy loading adds nothing"),
+    prioritize: bool = Query(True, description="Fetch contact, about, services... pages first instead of plain BFS"),
 ):
     try:
         req = CrawlRequest(
@@ -1256,12 +4214,25 @@ async def crawl_get(
             sitemap_url=sitemap_url,
             sitemap_max_urls=sitemap_max_urls,
             use_js_rendering=use_js_rendering,
+            respect_crawl_delay=respect_crawl_delay,
             max_concurrent=max_concurrent,
+            cache_mode=cache_mode,
+            use_result_cache=use_result_cache,
+            stream=stream,
+            near_duplicate_threshold=near_duplicate_threshold,
+            boilerplate_threshold=boilerplate_threshold,
+            canonicalization=UrlCanonicalization(enabled=canonicalize, ignored_params=ignored_params or []),
+            max_bytes_per_page=max_bytes_per_page,
+            skip_binary_extensions=skip_binary_extensions,
+            render_blocking=RenderBlocking(enabled=block_render_resources, block_stylesheets=block_css),
+            render_budget=render_budget,
+            render_scroll=render_scroll,
+            prioritize=prioritize,
         )
 
-        pages = await crawl(req)
-        user_agent = req.user_agent or DEFAULT_HEADERS["User-Agent"]
-        md = aggregate_markdown(str(url), req, pages, user_agent)
+        if req.stream:
+            return StreamingResponse(stream_markdown(req), media_type="text/markdown; charset=utf-8")
+        md = await crawl_markdown(req)
         return PlainTextResponse(content=md, media_type="text/markdown; charset=utf-8")
     except Exception as e:
         import traceback
@@ -1275,9 +4246,9 @@ async def crawl_post(payload: CrawlRequest):
     try:
         if payload.depth < 0 or payload.max_pages < 1:
             raise HTTPException(status_code=400, detail="Invalid crawl parameters")
-        pages = await crawl(payload)
-        user_agent = payload.user_agent or DEFAULT_HEADERS["User-Agent"]
-        md = aggregate_markdown(str(payload.url), payload, pages, user_agent)
+        if payload.stream:
+            return StreamingResponse(stream_markdown(payload), media_type="text/markdown; charset=utf-8")
+        md = await crawl_markdown(payload)
         return PlainTextResponse(content=md, media_type="text/markdown; charset=utf-8")
     except Exception as e:
         import traceback
@@ -0,0 +1,76 @@
+"""Microbenchmark: compiled navigation/noise matcher vs the per-pattern regex loop.
+
+Run from the repository root:
+
+    python benchmarks/bench_navigation_matcher.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+from fixtures import navigation_heavy_page  # noqa: E402
+
+
+def legacy_is_navigation_item(text: str) -> bool:
+    text_clean = text.lower().strip('- ').strip()
+    for pattern in app.NAVIGATION_PATTERNS:
+        if re.match(pattern, text_clean, re.IGNORECASE):
+            return True
+    return False
+
+
+def legacy_is_noise_heading(text: str) -> bool:
+    text_clean = text.lower().strip('# ').strip()
+    text_clean = re.sub(r'\[|\]', '', text_clean)
+    return text_clean in app.NOISE_HEADINGS or len(text_clean) < 3
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        app.is_navigation_item.cache_clear()
+        app.is_noise_heading.cache_clear()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    html = navigation_heavy_page()
+    soup = app.parse_html(html)
+    texts = [el.get_text(" ", strip=True) for el in soup.find_all(["h1", "h2", "h3", "p", "li"])]
+    assert all(legacy_is_navigation_item(t) == app.is_navigation_item(t) for t in texts)
+
+    compiled = (app.is_navigation_item, app.is_noise_heading)
+    legacy = (legacy_is_navigation_item, legacy_is_noise_heading)
+
+    def run_matchers(nav, noise):
+        def run():
+            for text in texts:
+                nav(text)
+                noise(text)
+        return run
+
+    def run_extraction(nav, noise):
+        def run():
+            app.is_navigation_item, app.is_noise_heading = nav, noise
+            try:
+                app.clean_html_to_markdown(html, "https://www.planzer.ch/de/", 200000)
+            finally:
+                app.is_navigation_item, app.is_noise_heading = compiled
+        return run
+
+    print(f"page: {len(html) / 1024:.0f} KiB, {len(texts)} candidate strings")
+    for label, factory in (("matcher calls", run_matchers), ("clean_html_to_markdown", run_extraction)):
+        old = best_of(factory(*legacy))
+        new = best_of(factory(*compiled))
+        print(f"{label:24s} legacy {old * 1000:8.2f} ms   compiled {new * 1000:8.2f} ms   x{old / new:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
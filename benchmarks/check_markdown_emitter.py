@@ -0,0 +1,107 @@
+"""Differential check: single-walk markdown emitter vs the per-element emitter it replaced.
+
+Run from the repository root (exits non-zero on a mismatch):
+
+    python benchmarks/check_markdown_emitter.py
+
+On flat pages both emitters must produce exactly the same extraction. On
+nested layouts the old emitter repeated text (a <p> inside an <li> came out
+as a list item and again as a paragraph); there the new output must only
+drop such repeats: every line it emits has to be text the old one emitted.
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app  # noqa: E402
+from fixtures import catalog_page, navigation_heavy_page, nested_layout_page, site_page  # noqa: E402
+
+LEGACY_CONTENT_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6", "p", "ul", "ol", "pre", "code", "blockquote"})
+
+
+def legacy_iter_markdown_parts(main):
+    for element in main.descendants:
+        if element.name not in LEGACY_CONTENT_TAGS:
+            continue
+        if element.find_parent(["pre", "code"]):
+            continue
+        name = element.name
+        text = element.get_text(" ", strip=True)
+        if not text:
+            continue
+        text = app.normalize_text(text)
+        if name == "p" and len(text) < 25 and not any(c in text for c in '.,;:!?'):
+            continue
+        if app.is_navigation_item(text):
+            continue
+        if name in {"h1", "h2", "h3", "h4", "h5", "h6"}:
+            if not app.is_noise_heading(text):
+                yield "#" * int(name[1]) + " " + text
+        elif name == "p":
+            yield text
+        elif name in {"ul", "ol"}:
+            for li in element.find_all("li", recursive=False):
+                li_text = li.get_text(" ", strip=True)
+                if li_text:
+                    li_text = app.normalize_text(li_text)
+                    if not app.is_navigation_item(li_text):
+                        yield ("- " if name == "ul" else "1. ") + li_text
+        elif name in {"pre", "code"}:
+            yield "```\n" + text + "\n```"
+        elif name == "blockquote":
+            yield "> " + text
+
+
+def extract(emitter, html: str, max_chars: int):
+    current = app.iter_markdown_parts
+    app.iter_markdown_parts = emitter
+    try:
+        start = time.perf_counter()
+        result = app.clean_html_to_markdown(html, "https://example.ch/page", max_chars)
+        return result, time.perf_counter() - start
+    finally:
+        app.iter_markdown_parts = current
+
+
+MARKUP_PREFIX = re.compile(r"^(?:#+ |- |1\. |> |```)")
+
+
+def line_text(line: str) -> str:
+    return MARKUP_PREFIX.sub("", line).strip("`").strip()
+
+
+def main() -> int:
+    failures = 0
+    flat = {f"site_page_{i}": site_page(i, 100) for i in range(0, 100, 7)}
+    flat["navigation_heavy"] = navigation_heavy_page()
+    flat["catalog"] = catalog_page()
+    for name, html in flat.items():
+        for max_chars in (1000, 15000, 200000):
+            (old, t_old), (new, t_new) = extract(legacy_iter_markdown_parts, html, max_chars), extract(app.iter_markdown_parts, html, max_chars)
+            same = old == new
+            failures += not same
+            print(f"{'ok  ' if same else 'FAIL'} {name:<18} max_chars={max_chars:<6} "
+                  f"{t_old * 1000:8.1f} ms -> {t_new * 1000:8.1f} ms")
+
+    for depth in (5, 25, 60):
+        html = nested_layout_page(wrapper_depth=depth)
+        (old, t_old), (new, t_new) = extract(legacy_iter_markdown_parts, html, 200000), extract(app.iter_markdown_parts, html, 200000)
+        old_text = old['markdown']
+        new_lines = [line for line in new['markdown'].splitlines() if line.strip() and not line.startswith("```")]
+        missing = [line for line in new_lines if line_text(line) not in old_text]
+        ok = not missing and len(new['markdown']) <= len(old_text) and old['contact_info'] == new['contact_info']
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} nested depth={depth:<3} {len(old_text):6} -> {len(new['markdown']):6} chars "
+              f"{t_old * 1000:8.1f} ms -> {t_new * 1000:8.1f} ms")
+        for line in missing[:5]:
+            print("     not in old output:", line[:100])
+
+    print("all emitter checks passed" if not failures else f"{failures} emitter check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
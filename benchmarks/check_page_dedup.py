@@ -0,0 +1,100 @@
+"""Regression check: page deduplication with contact details.
+
+Run from the repository root (exits non-zero on a failure):
+
+    python benchmarks/check_page_dedup.py
+
+- the same page extracted under different hash seeds (as in separate
+  extraction worker processes) is one page, not several;
+- store pages differing only by their street address or phone are all kept;
+- pages differing only by a date are still near-duplicates.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+from fixtures import sentence  # noqa: E402
+
+BODY = " ".join(f"<p>{sentence(random.Random(i), 25)}.</p>" for i in range(12))
+
+
+def store_page(street: str, phone: str, date: str = "3 mars 2024") -> str:
+    return (
+        "<html lang='fr'><head><title>Magasin</title></head><body><main>"
+        f"<h1>Notre magasin</h1>{BODY}"
+        f"<p>Adresse: {street}, 1227 Carouge. Dépôt: Route des Jeunes 4, 1227 Les Acacias.</p>"
+        f"<p>Contact: info@velo.ch, vente@velo.ch, sav@velo.ch, Tél. {phone}</p>"
+        f"<p>Mis à jour le {date} Nous sommes ouverts du lundi au samedi.</p>"
+        "</main></body></html>"
+    )
+
+
+def to_page(url: str, data: dict) -> app.PageContent:
+    return app.PageContent(
+        url=url, title=data['title'], description=data['description'], markdown=data['markdown'],
+        crawled_at="2024-01-01T00:00:00Z", page_type=data['page_type'], lang=data['lang'],
+        contact_info=data['contact_info'], structured_data=data['structured_data'],
+        content_hash=data['content_hash'], simhash=data.get('simhash'),
+    )
+
+
+def extract_with_seed(html: str, seed: str) -> dict:
+    """clean_html_to_markdown in a fresh interpreter with PYTHONHASHSEED=seed."""
+    code = (
+        "import json, sys; sys.path.insert(0, sys.argv[1]); import app; "
+        "print(json.dumps(app.clean_html_to_markdown(sys.stdin.read(), 'https://velo.ch/magasin', 15000), default=str))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code, ROOT], input=html, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONHASHSEED": seed},
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def kept(pages, threshold: float = 0.9) -> int:
+    dedup = app.PageDeduplicator(threshold)
+    return sum(dedup.accept(page) for page in pages)
+
+
+def main() -> int:
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<30} {detail}")
+
+    html = store_page("Rue du Marché 12", "022 342 11 00")
+    extracted = [extract_with_seed(html, seed) for seed in ("1", "2", "3", "4")]
+    pages = [to_page(f"https://velo.ch/magasin?v={i}", data) for i, data in enumerate(extracted)]
+    check("same page, 4 hash seeds", kept(pages, 0.0) == 1 and kept(pages) == 1,
+          f"kept {kept(pages, 0.0)} (exact) / {kept(pages)} (near)")
+    check("stable markdown", len({data['markdown'] for data in extracted}) == 1,
+          f"{len({data['markdown'] for data in extracted})} distinct outputs")
+
+    stores = [
+        to_page(f"https://velo.ch/magasin/{i}", app.clean_html_to_markdown(
+            store_page(f"Rue du Marché {10 + i}", f"022 342 11 {10 + i}"), "https://velo.ch/magasin", 15000))
+        for i in range(5)
+    ]
+    check("5 stores, distinct addresses", kept(stores) == 5, f"kept {kept(stores)}")
+
+    dated = [
+        to_page(f"https://velo.ch/actu/{i}", app.clean_html_to_markdown(
+            store_page("Rue du Marché 12", "022 342 11 00", f"{i + 1} mars {2015 + i}"), "https://velo.ch/actu", 15000))
+        for i in range(5)
+    ]
+    check("5 pages, only the date differs", kept(dated) == 1, f"kept {kept(dated)}")
+
+    print("all dedup checks passed" if not failures else f"{failures} dedup check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
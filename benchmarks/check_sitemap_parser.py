@@ -0,0 +1,117 @@
+"""Regression check: read_sitemap only reads the direct fields of <url>/<sitemap>.
+
+Run from the repository root (exits non-zero on a failure):
+
+    python benchmarks/check_sitemap_parser.py
+
+Extension elements nested in a <url> (<image:loc>, <video:...>) must not
+replace the page's own <loc>, and a gzip bomb must be abandoned without
+ever being inflated in full. Sitemaps listing the same pages must not use
+up the max_urls budget of discovery.
+"""
+import asyncio
+import gzip
+import os
+import sys
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx  # noqa: E402
+
+import app  # noqa: E402
+from fixtures import image_urlset_xml, sitemap_index_xml, urlset_xml  # noqa: E402
+
+BASE = "https://shop.example.ch"
+PAGES = [f"{BASE}/produit/{name}" for name in ("a", "b", "c")]
+MORE_PAGES = [f"{BASE}/produit/{name}" for name in ("d", "e")]
+BOMB_MB = 200
+
+
+def gzip_bomb(megabytes: int) -> bytes:
+    """A gzip urlset inflating to `megabytes` MB of empty <url> elements."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    parts = [compressor.compress(b'<?xml version="1.0"?><urlset>')]
+    block = b"<url></url>" * (1024 * 1024 // 11)
+    parts.extend(compressor.compress(block) for _ in range(megabytes))
+    parts.append(compressor.flush())
+    return b"".join(parts)
+
+
+BOMB = gzip_bomb(BOMB_MB)
+
+
+def serve(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/sitemap-images.xml":
+        return httpx.Response(200, text=image_urlset_xml(PAGES))
+    if path == "/sitemap-images.xml.gz":
+        return httpx.Response(200, content=gzip.compress(image_urlset_xml(PAGES).encode()))
+    if path in ("/sitemap-plain.xml", "/sitemap-copy.xml"):
+        return httpx.Response(200, text=urlset_xml(PAGES))
+    if path == "/bomb.xml.gz":
+        return httpx.Response(200, content=BOMB)  # one network chunk
+    if path == "/sitemap.xml":
+        return httpx.Response(200, text=sitemap_index_xml([f"{BASE}/sitemap-copy.xml", f"{BASE}/more.xml"]))
+    if path == "/more.xml":
+        return httpx.Response(200, text=urlset_xml(MORE_PAGES))
+    if path == "/sitemap-index.xml":
+        return httpx.Response(200, text=sitemap_index_xml([f"{BASE}/sitemap-images.xml"]))
+    return httpx.Response(404)
+
+
+async def read(path: str):
+    async with httpx.AsyncClient(transport=httpx.MockTransport(serve)) as client:
+        return await app.read_sitemap(client, BASE + path, 10.0, "bypass", lambda url: True, 1000)
+
+
+async def discover(max_urls: int):
+    """Explicit sitemap, then /sitemap.xml: an index repeating it, plus more.xml."""
+    async with httpx.AsyncClient(transport=httpx.MockTransport(serve)) as client:
+        return await app.discover_sitemap_urls(
+            client, BASE + "/", BASE + "/sitemap-plain.xml", 10.0, True, max_urls,
+            cache_mode="bypass", robots_txt="",
+        )
+
+
+def main() -> int:
+    failures = 0
+    for path in ("/sitemap-images.xml", "/sitemap-images.xml.gz", "/sitemap-plain.xml"):
+        entries, children = asyncio.run(read(path))
+        urls = [entry.url for entry in entries]
+        ok = urls == PAGES and not children and all(entry.lastmod for entry in entries)
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {path:<24} {urls}")
+
+    entries, children = asyncio.run(read("/sitemap-index.xml"))
+    ok = not entries and children == [f"{BASE}/sitemap-images.xml"]
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {'/sitemap-index.xml':<24} {children}")
+
+    # One sitemap at a time: the repeated listing is read before more.xml
+    concurrency, app.SITEMAP_FETCH_CONCURRENCY = app.SITEMAP_FETCH_CONCURRENCY, 1
+    try:
+        urls = asyncio.run(discover(len(PAGES) + len(MORE_PAGES)))
+    finally:
+        app.SITEMAP_FETCH_CONCURRENCY = concurrency
+    ok = urls == PAGES + MORE_PAGES
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {'overlapping sitemaps':<24} {len(urls)} URLs")
+
+    tracemalloc.start()
+    entries, children = asyncio.run(read("/bomb.xml.gz"))
+    peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    limit_mb = app.MAX_SITEMAP_BYTES / (1024 * 1024)
+    ok = not entries and peak_mb < limit_mb
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {'/bomb.xml.gz':<24} {len(BOMB) // 1024} KB -> {BOMB_MB} MB, "
+          f"peak {peak_mb:.1f} MB allocated (limit {limit_mb:.0f} MB)")
+
+    print("all sitemap checks passed" if not failures else f"{failures} sitemap check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
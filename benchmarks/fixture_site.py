@@ -0,0 +1,110 @@
+"""Local fixture website served over HTTP for offline benchmarks.
+
+Routes:
+    /site/<n>                static pages linking to each other (n < n_pages)
+    /product/<n>             static pages only reachable from the sitemap
+    /planzer                 large navigation-heavy page (planzer.ch case)
+    /spa                     JavaScript app shell with an empty body
+    /slow/<n>                static page answered after `slow_delay` seconds
+    /fail/<n>                HTTP 500
+    /files/<name>.pdf        binary download (application/pdf)
+    /robots.txt              points to the sitemap index
+    /sitemap.xml             index of 5 child sitemaps (odd ones gzipped)
+    /sitemaps/<k>.xml[.gz]   1000 URLs each, 5000 in total
+"""
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from fixtures import navigation_heavy_page, site_page, sitemap_index_xml, spa_shell, urlset_xml
+
+SITEMAP_CHILDREN = 5
+URLS_PER_SITEMAP = 1000
+
+
+class FixtureSite:
+    """Serve the fixture site from a background thread on 127.0.0.1."""
+
+    def __init__(self, n_pages: int = 300, slow_delay: float = 0.5, port: int = 0):
+        self.n_pages = n_pages
+        self.slow_delay = slow_delay
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._planzer = navigation_heavy_page().encode()
+        self._pdf = b"%PDF-1.4\n" + b"0" * (2 * 1024 * 1024)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FixtureSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, path: str) -> Tuple[int, str, bytes]:
+        """Return (status, content type, body) for a request path."""
+        base = self.base_url
+        parts = path.split("?", 1)[0].strip("/").split("/")
+        html = "text/html; charset=utf-8"
+        if parts[0] in ("site", "product", "slow") and len(parts) == 2 and parts[1].isdigit():
+            if parts[0] == "slow":
+                time.sleep(self.slow_delay)
+            return 200, html, site_page(int(parts[1]), self.n_pages).encode()
+        if parts == ["planzer"]:
+            return 200, html, self._planzer
+        if parts == ["spa"]:
+            return 200, html, spa_shell().encode()
+        if parts[0] == "fail":
+            return 500, "text/plain", b"Internal Server Error"
+        if parts[0] == "files":
+            return 200, "application/pdf", self._pdf
+        if parts == ["robots.txt"]:
+            return 200, "text/plain", f"User-agent: *\nAllow: /\nSitemap: {base}/sitemap.xml\n".encode()
+        if parts == ["sitemap.xml"]:
+            children = [
+                f"{base}/sitemaps/{k}.xml" + (".gz" if k % 2 else "") for k in range(SITEMAP_CHILDREN)
+            ]
+            return 200, "application/xml", sitemap_index_xml(children).encode()
+        if parts[0] == "sitemaps" and len(parts) == 2:
+            k = int(parts[1].split(".", 1)[0])
+            start = k * URLS_PER_SITEMAP
+            urls = [
+                f"{base}/site/{n}" if n < self.n_pages else f"{base}/product/{n}"
+                for n in range(start, start + URLS_PER_SITEMAP)
+            ]
+            body = urlset_xml(urls).encode()
+            if parts[1].endswith(".gz"):
+                return 200, "application/gzip", gzip.compress(body)
+            return 200, "application/xml", body
+        return 404, "text/plain", b"Not Found"
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                status, content_type, body = site.route(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
@@ -0,0 +1,188 @@
+"""Synthetic HTML fixtures shared by the benchmarks.
+
+Pages are generated deterministically so results are comparable between
+commits without network access.
+"""
+import random
+from typing import List
+
+# Menu labels typical of planzer.ch (DE/FR logistics site with a mega-menu)
+PLANZER_MENU = [
+    "Startseite", "Unternehmen", "Über uns", "Geschichte", "Karriere", "Jobs",
+    "Standorte", "Medien", "Blog", "Referenzen", "Qualität", "Nachhaltigkeit",
+    "Mobilität", "Sicherheit", "Technik", "Transport", "Lagerlogistik", "Lagerung",
+    "Gesamtlösungen", "National", "International", "Stückgut", "Pharma", "Pakete",
+    "Homeservice", "Nachtexpress", "Spezial", "Container", "Umzug", "Verzollungen",
+    "Konfektionierung", "Kommissionierung", "Cross Docking", "E-Commerce",
+    "Ersatzteillogistik", "Eventlogistik", "Fitness", "Food", "Gefahrgut",
+    "Outsourcing", "City-Logistik", "Kontakt", "DE", "FR", "IT", "EN", "CH",
+]
+
+WORDS = (
+    "wir transportieren lagern und verteilen waren für kunden in der ganzen schweiz "
+    "mit modernen fahrzeugen zuverlässig pünktlich nachhaltig und persönlich "
+    "nous accompagnons particuliers et professionnels dans toutes les étapes"
+).split()
+
+
+def sentence(rng: random.Random, n_words: int = 18) -> str:
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    return " ".join(words).capitalize() + "."
+
+
+def menu_html(labels: List[str]) -> str:
+    return "<ul>" + "".join(
+        f'<li><a href="/de/{label.lower().replace(" ", "-")}">{label}</a></li>' for label in labels
+    ) + "</ul>"
+
+
+def navigation_heavy_page(n_sections: int = 120, seed: int = 7) -> str:
+    """Large page dominated by repeated mega-menus, like the planzer.ch case."""
+    rng = random.Random(seed)
+    menu = menu_html(PLANZER_MENU)
+    body: List[str] = [f"<header><nav>{menu}{menu}</nav></header><main>"]
+    for i in range(n_sections):
+        body.append(f"<h2>{rng.choice(PLANZER_MENU)}</h2>")
+        body.append(f"<h3>Leistung {i}: {sentence(rng, 5)}</h3>")
+        body.append(f"<p>{sentence(rng)} {sentence(rng)}</p>")
+        body.append(menu)
+        body.append("<ul>" + "".join(f"<li>{sentence(rng, 8)}</li>" for _ in range(4)) + "</ul>")
+        body.extend(f"<p>{label}</p>" for label in rng.sample(PLANZER_MENU, 6))
+    body.append(f"</main><footer>{menu}<p>Planzer Transport AG, Lerzenstrasse 14, 8953 Dietikon</p></footer>")
+    return (
+        '<!doctype html><html lang="de"><head><title>Planzer – Transport und Logistik</title>'
+        '<meta name="description" content="Transport, Lagerlogistik und Distribution.">'
+        '<link rel="canonical" href="https://www.planzer.ch/de/"></head><body>'
+        + "".join(body) + "</body></html>"
+    )
+
+
+SITE_SECTIONS = ["services", "contact", "a-propos", "magasin", "faq", "blog", "produit"]
+
+
+def site_page(i: int, n_pages: int, n_links: int = 8, seed: int = 11) -> str:
+    """Static page `i` of the fixture site: shared header/footer, unique body.
+
+    Body links point to other pages of the site, plus a few slow, failing and
+    binary (PDF) URLs so crawls exercise those paths too.
+    """
+    rng = random.Random(seed * 100003 + i)
+    header_links = "".join(
+        f'<li><a href="/site/{k}">{SITE_SECTIONS[k % len(SITE_SECTIONS)].capitalize()}</a></li>'
+        for k in range(6)
+    )
+    links = [f"/site/{rng.randrange(n_pages)}" for _ in range(n_links)]
+    if i % 10 == 3:
+        links.append(f"/slow/{i}")
+    if i % 10 == 7:
+        links.append(f"/fail/{i}")
+    if i % 15 == 5:
+        links.append(f"/files/brochure-{i}.pdf")
+    body = [f"<h1>{SITE_SECTIONS[i % len(SITE_SECTIONS)].capitalize()} {i}</h1>"]
+    for k in range(rng.randint(4, 10)):
+        body.append(f"<h2>Rubrique {i}.{k}</h2>")
+        body.append(f"<p>{sentence(rng, 25)} {sentence(rng, 20)}</p>")
+        if k % 3 == 0:
+            body.append("<ul>" + "".join(f"<li>{sentence(rng, 9)}</li>" for _ in range(4)) + "</ul>")
+    if i % len(SITE_SECTIONS) == 1:
+        body.append(
+            "<p>Email: info@example.ch Téléphone: 022 345 67 89 Route des Jeunes 4, 1227 Les Acacias</p>"
+            "<p>Lundi: fermé Mardi: 09:00 - 18:30 Samedi: 09:00 - 17:00 Dimanche: fermé</p>"
+        )
+    body.append("<p>" + " ".join(f'<a href="{href}">Voir {href}</a>' for href in links) + "</p>")
+    return (
+        f'<!doctype html><html lang="fr"><head><title>Page {i} – Example SA</title>'
+        f'<meta name="description" content="Page {i} du site de test.">'
+        f'<link rel="canonical" href="/site/{i}"></head><body>'
+        f'<header><nav><ul>{header_links}</ul></nav></header><main>{"".join(body)}</main>'
+        '<footer><h2>Newsletter</h2><p>Inscrivez-vous pour recevoir nos offres et nos conseils chaque mois.</p>'
+        '<p>Example SA, Route des Jeunes 4, 1227 Les Acacias. Tous droits réservés.</p></footer>'
+        "</body></html>"
+    )
+
+
+def spa_shell() -> str:
+    """Client-rendered app shell: almost no text until JavaScript runs."""
+    return (
+        '<!doctype html><html lang="fr"><head><title>App</title>'
+        '<script type="module" src="/assets/index.js"></script></head>'
+        '<body><div id="root"></div><noscript>Activez JavaScript.</noscript></body></html>'
+    )
+
+
+def urlset_xml(urls: List[str]) -> str:
+    entries = "".join(
+        f"<url><loc>{url}</loc><lastmod>2024-05-{i % 28 + 1:02d}</lastmod>"
+        f"<priority>0.{(i % 9) + 1}</priority></url>"
+        for i, url in enumerate(urls)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+    )
+
+
+def image_urlset_xml(urls: List[str], image_host: str = "https://cdn.example.ch") -> str:
+    """Urlset with an <image:image> per page, as Shopify and Yoast emit by default."""
+    entries = "".join(
+        f"<url><loc>{url}</loc>"
+        f"<image:image><image:loc>{image_host}/img/{i}.jpg</image:loc>"
+        f"<image:title>Produit {i}</image:title></image:image>"
+        f"<lastmod>2024-05-{i % 28 + 1:02d}</lastmod></url>"
+        for i, url in enumerate(urls)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+        'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">'
+        f"{entries}</urlset>"
+    )
+
+
+def sitemap_index_xml(urls: List[str]) -> str:
+    entries = "".join(f"<sitemap><loc>{url}</loc></sitemap>" for url in urls)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>'
+    )
+
+
+def catalog_page(n_products: int = 800, seed: int = 3) -> str:
+    """Long flat product listing (content far beyond max_chars_per_page)."""
+    rng = random.Random(seed)
+    items = "".join(
+        f"<h3>Produit {i}</h3><p>{sentence(rng, 30)}</p>"
+        f"<ul><li>{sentence(rng, 8)}</li><li>Prix CHF {i}.90</li></ul>"
+        for i in range(n_products)
+    )
+    return (
+        '<!doctype html><html lang="fr"><head><title>Catalogue</title></head><body><main>'
+        f"<h1>Catalogue</h1>{items}"
+        "<p>Email: shop@example.ch Téléphone: 022 345 67 89</p></main></body></html>"
+    )
+
+
+def nested_layout_page(n_sections: int = 40, wrapper_depth: int = 25, seed: int = 5) -> str:
+    """Page-builder style layout: content wrapped in deep <div> stacks, with
+    paragraphs inside list items, nested lists, quotes containing paragraphs,
+    inline code and preformatted blocks."""
+    rng = random.Random(seed)
+    sections = []
+    for i in range(n_sections):
+        body = (
+            f"<h2>Section {i}</h2>"
+            f"<p>{sentence(rng, 18)} <code>option_{i}</code> {sentence(rng, 10)}</p>"
+            "<ul>"
+            f"<li><p>{sentence(rng, 12)}</p></li>"
+            f"<li><strong>{sentence(rng, 3)}</strong> {sentence(rng, 9)}"
+            f"<ul><li>{sentence(rng, 7)}</li><li><p>{sentence(rng, 8)}</p></li></ul></li>"
+            "</ul>"
+            f"<blockquote><p>{sentence(rng, 15)}</p><p>{sentence(rng, 11)}</p></blockquote>"
+            f"<pre><code>curl -s https://example.ch/api/{i}</code></pre>"
+        )
+        sections.append("<div class='wrap'>" * wrapper_depth + body + "</div>" * wrapper_depth)
+    return (
+        '<!doctype html><html lang="fr"><head><title>Documentation</title></head><body><main>'
+        + "".join(sections)
+        + "</main></body></html>"
+    )
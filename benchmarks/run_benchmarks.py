@@ -0,0 +1,265 @@
+"""Offline benchmark suite: per-stage timings and end-to-end crawls.
+
+Everything runs against a local fixture site (see fixture_site.py), so
+results only depend on the code and the machine. Run from the repository
+root and compare the JSON output between commits:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --output after.json
+
+Times are milliseconds. End-to-end crawls bypass the HTTP and result caches
+and, unless --js is given, Playwright rendering.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+
+import app  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+from fixtures import navigation_heavy_page, site_page, spa_shell  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        'runs': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p95_ms': round(percentile(samples_ms, 0.95), 3),
+    }
+
+
+def time_stage(fn: Callable[[], Any], runs: int) -> Dict[str, float]:
+    fn()  # warm-up (regex compilation, lru caches)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def make_pages(n: int) -> List[app.PageContent]:
+    pages = []
+    for i in range(n):
+        url = f"http://fixture.test/site/{i}"
+        data = app.clean_html_to_markdown(site_page(i, n), url, 15000)
+        pages.append(app.PageContent(
+            url=url,
+            title=data['title'],
+            description=data['description'],
+            markdown=data['markdown'],
+            crawled_at="2024-01-01T00:00:00Z",
+            page_type=data['page_type'],
+            lang=data['lang'],
+            contact_info=data['contact_info'],
+            structured_data=data['structured_data'],
+            content_hash=data['content_hash'],
+            simhash=data.get('simhash'),
+        ))
+    return pages
+
+
+def bench_stages(site: FixtureSite, runs: int) -> Dict[str, Dict[str, float]]:
+    static = site_page(1, site.n_pages)
+    planzer = navigation_heavy_page()
+    spa = spa_shell()
+    url = site.base_url + "/site/1"
+    pages = make_pages(50)
+    request = app.CrawlRequest(url=site.base_url)
+
+    async def sitemap() -> None:
+        async with httpx.AsyncClient() as client:
+            urls = await app.discover_sitemap_urls(
+                client, site.base_url + "/", None, 30.0, True, 5000, cache_mode="bypass"
+            )
+        assert len(urls) == 5000, len(urls)
+
+    return {
+        'clean_html_to_markdown.static': time_stage(lambda: app.clean_html_to_markdown(static, url, 15000), runs),
+        'clean_html_to_markdown.planzer': time_stage(lambda: app.clean_html_to_markdown(planzer, url, 15000), runs),
+        'extract_links.static': time_stage(lambda: app.extract_links(static, url), runs),
+        'is_js_rendered_site.static': time_stage(lambda: app.is_js_rendered_site(static), runs),
+        'is_js_rendered_site.spa': time_stage(lambda: app.is_js_rendered_site(spa), runs),
+        'analyze_page.static': time_stage(lambda: app.analyze_page(static, url, 15000, True, True), runs),
+        'aggregate_markdown.50_pages': time_stage(
+            lambda: app.aggregate_markdown(site.base_url, request, pages, "bench"), max(3, runs // 5)
+        ),
+        'discover_sitemap_urls.5000': time_stage(lambda: asyncio.run(sitemap()), max(3, runs // 10)),
+    }
+
+
+async def bench_crawl(request: app.CrawlRequest) -> Dict[str, Any]:
+    """Crawl once, timing each page from the start of its fetch to its delivery."""
+    started: Dict[str, float] = {}
+    latencies: List[float] = []
+    failed = 0
+    original_fetch_html = app.fetch_html
+
+    async def timed_fetch_html(client, url, *args, **kwargs):
+        started.setdefault(url, time.perf_counter())
+        return await original_fetch_html(client, url, *args, **kwargs)
+
+    async def on_page(order: int, page) -> None:
+        nonlocal failed
+        if page is None:
+            failed += 1
+            return
+        latencies.append((time.perf_counter() - started[page.url]) * 1000)
+
+    app.fetch_html = timed_fetch_html
+    try:
+        start = time.perf_counter()
+        await app.crawl(request, on_page=on_page)
+        elapsed = time.perf_counter() - start
+    finally:
+        app.fetch_html = original_fetch_html
+
+    result = {
+        'pages': len(latencies),
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    result.update({f'page_{k}': v for k, v in summarize(latencies).items() if k != 'runs'})
+    return result
+
+
+def bench_end_to_end(site: FixtureSite, use_js: bool) -> Dict[str, Any]:
+    common = dict(
+        cache_mode="bypass",
+        use_result_cache=False,
+        use_js_rendering=use_js,
+        respect_crawl_delay=False,
+        max_concurrent=10,
+        timeout=10.0,
+    )
+    scenarios = {
+        'crawl.depth2_100_pages': app.CrawlRequest(
+            url=site.base_url + "/site/0", depth=2, max_pages=100, **common
+        ),
+        'crawl.sitemap_200_pages': app.CrawlRequest(
+            url=site.base_url + "/", depth=0, max_pages=200, use_sitemap=True, sitemap_max_urls=5000, **common
+        ),
+    }
+    if use_js:
+        scenarios['crawl.spa'] = app.CrawlRequest(url=site.base_url + "/spa", depth=0, max_pages=1, **common)
+
+    async def run_all() -> Dict[str, Any]:
+        app.EXTRACTION_POOL.start()
+        if use_js:
+            await app.BROWSER_POOL.start()
+        try:
+            results: Dict[str, Any] = {name: await bench_crawl(req) for name, req in scenarios.items()}
+            # Before the pool closes: its worker processes are still alive
+            results['workers_peak_rss_mb'] = workers_peak_rss_mb()
+            return results
+        finally:
+            if use_js:
+                await app.BROWSER_POOL.close()
+            app.EXTRACTION_POOL.close()
+
+    return asyncio.run(run_all())
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def workers_peak_rss_mb() -> Optional[float]:
+    """Summed peak RSS (VmHWM) of the live extraction worker processes.
+
+    0 with the thread/inline executors; None where /proc is unavailable.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    total_kb = 0
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--runs", type=int, default=50, help="iterations per stage benchmark")
+    parser.add_argument("--executor", choices=["process", "thread", "inline"], default="process",
+                        help="extraction executor used for end-to-end crawls")
+    parser.add_argument("--js", action="store_true", help="enable Playwright rendering (needs Chromium)")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-crawls", action="store_true")
+    args = parser.parse_args()
+
+    app.EXTRACTION_POOL.mode = args.executor
+    report: Dict[str, Any] = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'executor': args.executor,
+            'extraction_workers': app.EXTRACTION_POOL.workers,
+            'js_rendering': args.js,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+    }
+    with FixtureSite() as site:
+        if not args.skip_stages:
+            report['stages'] = bench_stages(site, args.runs)
+            report['stages_peak_rss_mb'] = peak_rss_mb()
+        if not args.skip_crawls:
+            report['crawls'] = bench_end_to_end(site, args.js)
+            # With --executor process, extraction runs in workers not counted in peak_rss_mb
+            report['workers_peak_rss_mb'] = report['crawls'].pop('workers_peak_rss_mb')
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()